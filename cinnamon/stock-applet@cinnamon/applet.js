@@ -2,7 +2,9 @@ const Applet = imports.ui.applet;
 const PopupMenu = imports.ui.popupMenu;
 const St = imports.gi.St;
 const GLib = imports.gi.GLib;
+const Gio = imports.gi.Gio;
 const Soup = imports.gi.Soup;
+const ByteArray = imports.byteArray;
 const Util = imports.misc.util;
 const Lang = imports.lang;
 const Settings = imports.ui.settings;
@@ -58,11 +60,21 @@ StockApplet.prototype = {
 
             // Data storage for price history
             this.priceHistory = [];
+            this.maxPoints = 144; // Points shown in the chart
             this.currentStockInfo = null; // Store current stock info for chart scaling
             this.dataFile = GLib.get_home_dir() + "/.local/share/cinnamon/applets/stock-applet@cinnamon/price_history.txt";
 
-            // Initialize HTTP session
+            // Initialize HTTP session; requests are asynchronous so a slow
+            // network never blocks the shell
             this.httpSession = new Soup.Session();
+            this.httpSession.timeout = 10; // seconds
+            this.pendingRequest = null; // {message, cancellable} in flight
+            this.requestedSymbol = null; // symbol of the last fetch
+            this.requestedToken = null; // API token of the last fetch
+
+            // History lines waiting to be appended to the data file
+            this.appendBuffer = "";
+            this.appending = false;
 
             // Ensure data directory exists
             let dataDir = GLib.get_home_dir() + "/.local/share/cinnamon/applets/stock-applet@cinnamon";
@@ -148,6 +160,12 @@ StockApplet.prototype = {
         global.log("  fontShadowColor: " + this.fontShadowColor);
 
         this.setupTimer();
+        if (this.requestedSymbol !== this.stockSymbol ||
+            this.requestedToken !== this.apiToken) {
+            // New symbol or token, fetch in the background
+            this.cancelRequest();
+            this.updateStockInfo();
+        }
         this.updateDisplay();
         this.rebuildMenu();
         this.rebuildPanelChart();
@@ -352,7 +370,7 @@ StockApplet.prototype = {
             if (GLib.file_test(this.dataFile, GLib.FileTest.EXISTS)) {
                 let [success, contents] = GLib.file_get_contents(this.dataFile);
                 if (success) {
-                    let lines = contents.toString().trim().split('\n');
+                    let lines = ByteArray.toString(contents).trim().split('\n');
                     this.priceHistory = [];
                     for (let line of lines) {
                         if (line.trim()) {
@@ -365,6 +383,8 @@ StockApplet.prototype = {
                             }
                         }
                     }
+                    // The file keeps the full history, the chart the last points
+                    this.priceHistory = this.priceHistory.slice(-this.maxPoints);
                 }
             }
         } catch (e) {
@@ -376,7 +396,6 @@ StockApplet.prototype = {
     savePriceData: function(price) {
         try {
             let timestamp = Math.floor(Date.now() / 1000);
-            let line = timestamp + ": " + price + "\n";
 
             // Add to memory
             this.priceHistory.push({
@@ -385,103 +404,195 @@ StockApplet.prototype = {
             });
 
             // Keep only last 24 hours of data (assuming 10-minute intervals, that's 144 points)
-            let maxPoints = 144;
-            if (this.priceHistory.length > maxPoints) {
-                this.priceHistory = this.priceHistory.slice(-maxPoints);
+            if (this.priceHistory.length > this.maxPoints) {
+                this.priceHistory.shift();
             }
 
-            // Write to file
-            let content = "";
-            for (let data of this.priceHistory) {
-                content += data.timestamp + ": " + data.price + "\n";
-            }
-            GLib.file_set_contents(this.dataFile, content);
+            // Append only the new point to the file
+            this.appendToHistoryFile(timestamp + ": " + price + "\n");
 
         } catch (e) {
             global.logError("Error saving price data: " + e);
         }
     },
 
-    getStockInfo: function() {
-        try {
-            if (!this.apiToken || this.apiToken.trim() === "") {
-                return {
-                    error: "no_token",
-                    current: null,
-                    high: null,
-                    low: null
-                };
-            }
+    appendToHistoryFile: function(text) {
+        // Appends are asynchronous and queued, so they stay in order
+        this.appendBuffer += text;
+        if (this.appending) {
+            return;
+        }
 
-            let symbol = this.stockSymbol || "NVDA";
-            let url = "https://finnhub.io/api/v1/quote?token=" + this.apiToken + "&symbol=" + symbol;
+        let data = this.appendBuffer;
+        this.appendBuffer = "";
+        this.appending = true;
 
+        let file = Gio.File.new_for_path(this.dataFile);
+        file.append_to_async(Gio.FileCreateFlags.NONE, GLib.PRIORITY_DEFAULT, null,
+                             Lang.bind(this, function(file, result) {
+            let stream;
             try {
-                // Use curl as a fallback for HTTP requests
-                let command = ['curl', '-s', '-X', 'GET', url];
-                let [success, stdout, stderr] = GLib.spawn_command_line_sync(command.join(' '));
-
-                if (success && stdout) {
-                    let responseText = stdout.toString();
-                    if (responseText) {
-                        try {
-                            let data = JSON.parse(responseText);
-                            if (data.c !== undefined) {
-                                return {
-                                    current: data.c,
-                                    high: data.h,
-                                    low: data.l,
-                                    symbol: symbol
-                                };
-                            }
-                        } catch (e) {
-                            global.logError("Error parsing stock data: " + e);
-                        }
-                    }
+                stream = file.append_to_finish(result);
+            } catch (e) {
+                global.logError("Error opening price history: " + e);
+                this.appending = false;
+                return;
+            }
+            stream.write_bytes_async(new GLib.Bytes(data), GLib.PRIORITY_DEFAULT, null,
+                                     Lang.bind(this, function(stream, result) {
+                try {
+                    stream.write_bytes_finish(result);
+                } catch (e) {
+                    global.logError("Error saving price data: " + e);
                 }
+                stream.close_async(GLib.PRIORITY_DEFAULT, null,
+                                   Lang.bind(this, function(stream, result) {
+                    try {
+                        stream.close_finish(result);
+                    } catch (e) {
+                        global.logError("Error closing price history: " + e);
+                    }
+                    this.appending = false;
+                    if (this.appendBuffer) {
+                        this.appendToHistoryFile("");
+                    }
+                }));
+            }));
+        }));
+    },
+
+    fetchJson: function(url, callback) {
+        // Asynchronous GET with libsoup 3 or 2.4, callback(data, error)
+        this.cancelRequest();
+
+        let message = Soup.Message.new('GET', url);
+        if (!message) {
+            callback(null, "fetch_failed");
+            return;
+        }
+
+        let request = { message: message, cancellable: new Gio.Cancellable() };
+        this.pendingRequest = request;
+
+        let finish = Lang.bind(this, function(status, text) {
+            if (this.pendingRequest !== request) {
+                return; // Cancelled or superseded
+            }
+            this.pendingRequest = null;
+            if (status !== Soup.Status.OK || !text) {
+                callback(null, "fetch_failed");
+                return;
+            }
+            try {
+                callback(JSON.parse(text), null);
             } catch (e) {
-                global.logError("HTTP request failed: " + e);
+                global.logError("Error parsing stock data: " + e);
+                callback(null, "parse_error");
             }
+        });
+
+        if (Soup.MAJOR_VERSION >= 3) {
+            this.httpSession.send_and_read_async(message, GLib.PRIORITY_DEFAULT,
+                                                 request.cancellable,
+                                                 Lang.bind(this, function(session, result) {
+                let bytes = null;
+                try {
+                    bytes = session.send_and_read_finish(result);
+                } catch (e) {
+                    if (!e.matches || !e.matches(Gio.IOErrorEnum, Gio.IOErrorEnum.CANCELLED)) {
+                        global.logError("HTTP request failed: " + e);
+                    }
+                }
+                finish(message.get_status(),
+                       bytes ? ByteArray.toString(bytes.get_data()) : null);
+            }));
+        } else {
+            this.httpSession.queue_message(message, Lang.bind(this, function(session, message) {
+                finish(message.status_code,
+                       message.response_body ? message.response_body.data : null);
+            }));
+        }
+    },
+
+    cancelRequest: function() {
+        let request = this.pendingRequest;
+        if (!request) {
+            return;
+        }
+        this.pendingRequest = null;
+        if (Soup.MAJOR_VERSION >= 3) {
+            request.cancellable.cancel();
+        } else {
+            this.httpSession.cancel_message(request.message, Soup.Status.CANCELLED);
+        }
+    },
 
-            return {
-                error: "fetch_failed",
+    getStockInfo: function(callback) {
+        // Fetch the quote in the background, callback(info) when done
+        this.requestedSymbol = this.stockSymbol;
+        this.requestedToken = this.apiToken;
+        if (!this.apiToken || this.apiToken.trim() === "") {
+            callback({
+                error: "no_token",
                 current: null,
                 high: null,
                 low: null
-            };
+            });
+            return;
+        }
 
-        } catch (e) {
-            global.logError("Error getting stock info: " + e);
-            return {
-                error: "error",
+        let symbol = this.stockSymbol || "NVDA";
+        let url = "https://finnhub.io/api/v1/quote?token=" + encodeURIComponent(this.apiToken.trim()) +
+                  "&symbol=" + encodeURIComponent(symbol);
+
+        this.fetchJson(url, Lang.bind(this, function(data, error) {
+            if (!error && data && data.c !== undefined) {
+                callback({
+                    current: data.c,
+                    high: data.h,
+                    low: data.l,
+                    symbol: symbol
+                });
+                return;
+            }
+            callback({
+                error: error || "fetch_failed",
                 current: null,
                 high: null,
                 low: null
-            };
-        }
+            });
+        }));
     },
 
     updateStockInfo: function() {
-        let info = this.getStockInfo();
+        if (this.pendingRequest) {
+            return true; // Previous request still running, keep waiting for it
+        }
 
-        if (info.error === "no_token") {
-            this.set_applet_tooltip("Please set your Finnhub API token in preferences");
-        } else if (info.error) {
-            this.set_applet_tooltip("Error fetching stock data");
-        } else {
-            // Save price data
-            if (info.current !== null) {
-                this.savePriceData(info.current);
+        this.getStockInfo(Lang.bind(this, function(info) {
+            if (info.error === "no_token") {
+                this.set_applet_tooltip("Please set your Finnhub API token in preferences");
+            } else if (info.error) {
+                this.set_applet_tooltip("Error fetching stock data");
+            } else {
+                // Save price data
+                if (info.current !== null) {
+                    this.savePriceData(info.current);
+                }
+                this.updateDisplay(info);
             }
-            this.updateDisplay(info);
-        }
+        }));
 
         return true; // Continue the timer
     },
 
     updateDisplay: function(info) {
         if (!info) {
-            info = this.getStockInfo();
+            info = this.currentStockInfo;
+        }
+        if (!info) {
+            // Nothing fetched yet, the running or next fetch will update
+            return;
         }
 
         // Store current stock info for chart scaling
@@ -608,6 +719,7 @@ StockApplet.prototype = {
         if (this.timeout) {
             Mainloop.source_remove(this.timeout);
         }
+        this.cancelRequest();
     }
 };
 
@@ -4,55 +4,1732 @@ import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('MatePanelApplet', '4.0')
 
-from gi.repository import Gtk, MatePanelApplet, GLib, Gdk   # pyright: ignore[reportAttributeAccessIssue] # noqa: E402,E501
+from gi.repository import Gtk, MatePanelApplet, GLib, Gdk, Gio   # pyright: ignore[reportAttributeAccessIssue] # noqa: E402,E501
+import argparse                                        # noqa
+import bisect                                          # noqa
 import cairo                                           # noqa
+import concurrent.futures                              # noqa
+import csv                                             # noqa
+import fcntl                                           # noqa
+import gc                                              # noqa
+import heapq                                           # noqa
+import http.server                                     # noqa
+import itertools                                       # noqa
 import json                                            # noqa
+import math                                            # noqa
+import multiprocessing                                 # noqa
 import os                                              # noqa
+import random                                          # noqa
 import re                                              # noqa
+import socketserver                                    # noqa
+import struct                                          # noqa
+import sys                                             # noqa
+import tempfile                                        # noqa
+import threading                                       # noqa
 import time                                            # noqa
+import tracemalloc                                     # noqa
 import urllib.request                                  # noqa
 import urllib.error                                    # noqa
-from collections import deque                          # noqa
+import urllib.parse                                    # noqa
+import zlib                                            # noqa
+from collections import Counter, deque, namedtuple     # noqa
+
+
+class RedrawScheduler:
+    """Coalesce display refreshes and skip the ones nobody can see
+
+    Every consumer (panel widgets, chart window, tooltip) keeps its own
+    dirty flag and the data version it last rendered.  Changes only bump
+    the version or mark consumers dirty; the actual refresh happens once
+    per frame from an idle callback, and only for consumers that are stale
+    and currently visible.  Hidden consumers stay stale and are refreshed
+    when they become visible again.
+    """
+
+    # Run right before GTK's own layout/paint pass
+    # (GDK_PRIORITY_REDRAW is G_PRIORITY_HIGH_IDLE + 20)
+    PRIORITY = GLib.PRIORITY_HIGH_IDLE + 10
+
+    def __init__(self, use_idle=True):
+        self.version = 0  # Bumped on every data or settings change
+        self.consumers = {}
+        self.idle_id = None
+        self.suspended = False  # True while the session is locked
+        # Without a main loop (command line tools) flush() is called
+        # explicitly instead
+        self.use_idle = use_idle
+
+    def register(self, name, callback, is_visible=None):
+        """Register a consumer refreshed by callback() when dirty"""
+        self.consumers[name] = {'callback': callback,
+                                'is_visible': is_visible,
+                                'dirty': True,
+                                'drawn_version': -1}
+
+    def bump(self):
+        """Record a data change; every consumer becomes stale"""
+        self.version += 1
+        self.schedule()
+
+    def mark_dirty(self, *names):
+        """Force a refresh of consumers (default: all) without new data"""
+        for name in names or self.consumers:
+            if name in self.consumers:
+                self.consumers[name]['dirty'] = True
+        self.schedule()
+
+    def is_stale(self, name):
+        consumer = self.consumers[name]
+        return consumer['dirty'] or consumer['drawn_version'] != self.version
+
+    def schedule(self):
+        """Queue a single flush for the next frame"""
+        if self.use_idle and self.idle_id is None and not self.suspended:
+            self.idle_id = GLib.idle_add(self.flush, priority=self.PRIORITY)
+
+    def set_suspended(self, suspended):
+        """Pause all refreshes (e.g. while the screen is locked)"""
+        self.suspended = suspended
+        if suspended:
+            if self.idle_id is not None:
+                GLib.source_remove(self.idle_id)
+                self.idle_id = None
+        else:
+            self.schedule()
 
+    def is_visible(self, name):
+        consumer = self.consumers[name]
+        if self.suspended:
+            return False
+        if consumer['is_visible'] is None:
+            return True
+        try:
+            return bool(consumer['is_visible']())
+        except Exception:
+            return False
 
-class StockApplet:
-    def __init__(self, applet):
-        self.applet = applet
-        self.config_file = os.path.expanduser("~/.config/stock-applet.json")
+    def flush(self):
+        """Refresh every dirty and visible consumer"""
+        self.idle_id = None
+        for name, consumer in self.consumers.items():
+            if not self.is_stale(name) or not self.is_visible(name):
+                continue
+            consumer['dirty'] = False
+            consumer['drawn_version'] = self.version
+            try:
+                consumer['callback']()
+            except Exception as e:
+                print(f"Error refreshing {name}: {e}")
+        return False  # One-shot idle callback
+
+
+class CircuitBreaker:
+    """Stop calling a failing service and probe it again on a backoff
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() refuses calls until the backoff delay has passed.  The next
+    call is a probe: success closes the breaker, failure opens it again
+    with the delay doubled (up to max_delay).  For periodic callers,
+    set_interval() scales the delays to the calling interval.  Callers
+    may be on different threads.
+    """
+
+    def __init__(self, failure_threshold=3, base_delay=60, max_delay=1800):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = 'closed'
+        self.failures = 0  # Consecutive failures
+        self.trips = 0  # Consecutive openings, drives the backoff
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def set_interval(self, seconds):
+        """Scale the backoff to a caller that calls every seconds
+
+        Delays shorter than the interval pass before the next call
+        anyway.  The first opening skips one call, each further one
+        doubles the number of skipped calls, up to 16.
+        """
+        self.base_delay = 1.5 * seconds
+        self.max_delay = 16.5 * seconds
+
+    def allow(self, now=None):
+        """Check whether a call may go through now"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            now = time.time() if now is None else now
+            if now >= self.open_until:
+                self.state = 'half_open'
+                return True
+            return False
 
-        # Load preferences
-        self.preferences = {
-            'show_current_price': True,
-            'show_daily_range': True,
-            'show_chart': False,
-            'stock_symbol': 'NVDA',
-            'api_token': '',
-            'update_interval': 10,  # minutes
-            'chart_width': 50,  # Width of each individual chart
-            'chart_transparency': 50,  # Chart fill transparency (0-100)
-            'chart_font_size': 10,  # Font size for chart labels
-            'chart_line_color': (0.2, 0.8, 0.2),  # RGB for line color (green)
-            'chart_fill_color': (0.2, 0.8, 0.2),  # RGB for fill color (green)
-            'chart_text_color': (1.0, 1.0, 1.0),  # RGB for text color (white)
-            'show_symbol_on_chart': True  # Show stock symbol on chart
-        }
-        self.load_preferences()
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trips = 0
+
+    def record_failure(self, now=None):
+        with self.lock:
+            self.failures += 1
+            if (self.state == 'half_open' or
+                    self.failures >= self.failure_threshold):
+                now = time.time() if now is None else now
+                delay = min(self.max_delay,
+                            self.base_delay * (2 ** self.trips))
+                self.trips += 1
+                self.state = 'open'
+                self.open_until = now + delay
+
+
+class FrameBudget:
+    """Cap the frame rate and CPU share of a panel animation
+
+    Frames are at least 1/max_fps apart, and once the time spent drawing
+    within the current one second window exceeds cpu_share of it, frames
+    are skipped until the next window starts.
+    """
+
+    def __init__(self, max_fps=30, cpu_share=0.02):
+        self.max_fps = max_fps
+        self.cpu_share = cpu_share
+        self.window_start = 0.0
+        self.spent = 0.0  # Drawing time in the current window
+        self.last_frame = 0.0
+
+    def should_draw(self, now):
+        """Check whether a frame may be drawn at time now"""
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.spent = 0.0
+        if self.spent >= self.cpu_share:
+            return False
+        return now - self.last_frame >= 1.0 / self.max_fps
+
+    def record(self, start, end):
+        """Account for a frame drawn from start to end"""
+        self.spent += end - start
+        self.last_frame = start
+
+
+class ScrollingPlot:
+    """Chart points cached on a surface that scrolls as points arrive
+
+    Charts place points by index, so once the window of points is full,
+    each new point moves all the others one step left.  The points are
+    drawn into a strip twice as wide as the plot, which is shown shifted
+    left by the points that scrolled out.  While the scale, size and
+    style stay the same, a new point only adds its own segment to the
+    strip.  Anything else, or running out of strip, repaints all points.
+    """
+
+    PAD = 2  # Room for line caps around the plot
+
+    def __init__(self):
+        self.surface = None
+        self.key = None  # Scale, size and style the strip was drawn with
+        self.first = 0  # Number of the point at strip x = PAD
+        self.count = 0  # Number of points drawn into the strip so far
+        self.repaints = 0  # Full repaints, for diagnostics
+
+    def paint(self, cr, area, key, count, values, paint_run):
+        """Paint values into area (left, top, width, height) of cr
+
+        Points are numbered in the order they were added; count is the
+        number of points added so far, values holds the newest of them.
+        paint_run(cr, run) paints a list of (x, value) points, using the
+        same y coordinates as the window.  Returns the window x of
+        values[0] and the distance between points.
+        """
+        left, top, width, height = area
+        pad = self.PAD
+        n = len(values)
+        step = width / (n - 1)
+        start = count - n  # Number of values[0]
+        key = (key, area, n)
+        new = count - self.count
+
+        if (self.surface is None or key != self.key or not 0 <= new < n or
+                pad + (count - 1 - self.first) * step >
+                self.surface.get_width() - pad):
+            strip_size = (int(2 * width) + 2 * pad, int(height) + 2 * pad)
+            if (self.surface is None or
+                    (self.surface.get_width(),
+                     self.surface.get_height()) != strip_size):
+                self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                                  *strip_size)
+            strip = cairo.Context(self.surface)
+            strip.set_operator(cairo.OPERATOR_CLEAR)
+            strip.paint()
+            strip.set_operator(cairo.OPERATOR_OVER)
+            self.first = start
+            self.repaints += 1
+            run = [(pad + i * step, value) for i, value in enumerate(values)]
+        elif new:
+            # Just the segments of the new points
+            strip = cairo.Context(self.surface)
+            run = [(pad + (start + i - self.first) * step, values[i])
+                   for i in range(n - new - 1, n)]
+        else:
+            run = None
+        if run:
+            strip.translate(0, pad - top)
+            paint_run(strip, run)
+        self.key = key
+        self.count = count
+
+        # Whole pixel offsets keep the strip sharp
+        offset = round((start - self.first) * step)
+        cr.save()
+        cr.rectangle(left, top - pad, width + pad, height + 2 * pad)
+        cr.clip()
+        cr.set_source_surface(self.surface, left - pad - offset, top - pad)
+        cr.paint()
+        cr.restore()
+        return left + (start - self.first) * step - offset, step
+
+
+def paint_plot_run(cr, points, bottom, fill_rgba, line_rgb, line_width):
+    """Fill under and stroke a run of (x, fill_y, line_y) chart points
+
+    Fill edges are snapped to whole pixels and lines have round caps, so
+    runs painted one after another join without seams.
+    """
+    cr.set_source_rgba(*fill_rgba)
+    cr.move_to(round(points[0][0]), bottom)
+    for x, fill_y, line_y in points:
+        cr.line_to(round(x), fill_y)
+    cr.line_to(round(points[-1][0]), bottom)
+    cr.close_path()
+    cr.fill()
+
+    cr.set_source_rgb(*line_rgb)
+    cr.set_line_width(line_width)
+    cr.set_line_cap(cairo.LINE_CAP_ROUND)
+    cr.set_line_join(cairo.LINE_JOIN_ROUND)
+    cr.move_to(points[0][0], points[0][2])
+    for x, fill_y, line_y in points[1:]:
+        cr.line_to(x, line_y)
+    cr.stroke()
+
+
+def is_transient_error(error):
+    """Check whether a fetch error is a (likely temporary) network problem"""
+    return bool(error) and (
+        error in ("fetch_failed", "circuit_open", "rate_limited") or
+        error.startswith("fetch_error"))
+
+
+def format_money(value, signed=False):
+    """Format an amount like '$1,234.56' (or '+$1,234.56' if signed)"""
+    sign = "-" if value < 0 else ("+" if signed else "")
+    return f"{sign}${abs(value):,.2f}"
+
+
+def parse_positions(text):
+    """Parse positions like 'NVDA:10@450.5, AAPL:5@170' (symbol:quantity
+    @cost basis per share) into {symbol: {'quantity', 'cost_basis'}}"""
+    positions = {}
+    for item in text.replace(',', ' ').split():
+        symbol, _, rest = item.partition(':')
+        quantity, _, cost_basis = rest.partition('@')
+        try:
+            positions[symbol.strip().upper()] = {
+                'quantity': float(quantity),
+                'cost_basis': float(cost_basis or 0)}
+        except ValueError:
+            continue  # Skip malformed entries
+    return positions
+
+
+def format_positions(positions):
+    """Format positions for parse_positions"""
+    return ", ".join(f"{symbol}:{p['quantity']:g}@{p['cost_basis']:g}"
+                     for symbol, p in positions.items())
+
+
+class Portfolio:
+    """Positions with incrementally maintained P&L aggregates
+
+    A quote only applies the difference to the symbol's previous quote
+    to the totals, so each update costs O(1) however many positions
+    there are.  The totals are recomputed from scratch every
+    RESYNC_INTERVAL updates to keep floating point drift in check.
+    """
+
+    RESYNC_INTERVAL = 10000
+
+    def __init__(self, positions):
+        self.positions = {}
+        for symbol, position in positions.items():
+            self.positions[symbol] = {
+                'quantity': position['quantity'],
+                'cost_basis': position['cost_basis'],
+                'price': None, 'value': 0.0, 'day_change': 0.0}
+        self.market_value = 0.0  # Value of the positions with a quote
+        self.cost = 0.0  # Cost of the positions with a quote
+        self.day_change = 0.0
+        self.priced = 0  # Number of positions with a quote
+        self.updates = 0
+
+    def apply_quote(self, symbol, price, previous_close=None):
+        """Update the totals for a new quote, return True if held"""
+        position = self.positions.get(symbol)
+        if position is None or price is None:
+            return False
 
-        # Data storage for charts (last 144 data points = 24 hours
-        # at 10min intervals)
-        self.max_data_points = 144
-        self.price_data = deque(maxlen=self.max_data_points)
-        self.timestamps = deque(maxlen=self.max_data_points)
-        self.current_stock_info = None  # Store current stock info for
-        #                                 chart scaling
+        quantity = position['quantity']
+        if position['price'] is None:
+            self.priced += 1
+            self.cost += quantity * position['cost_basis']
+        value = quantity * price
+        day_change = (quantity * (price - previous_close)
+                      if previous_close else 0.0)
+
+        self.market_value += value - position['value']
+        self.day_change += day_change - position['day_change']
+        position['price'] = price
+        position['value'] = value
+        position['day_change'] = day_change
+
+        self.updates += 1
+        if self.updates % self.RESYNC_INTERVAL == 0:
+            self.resync()
+        return True
 
-        # Price history file
-        self.data_file = os.path.expanduser(
-            "~/.local/share/mate-applets/stock-applet/price_history.txt")
-        self.ensure_data_directory()
-        self.load_price_history()
+    def resync(self):
+        """Recompute the totals from the positions"""
+        priced = [p for p in self.positions.values() if p['price'] is not None]
+        self.priced = len(priced)
+        self.market_value = sum(p['value'] for p in priced)
+        self.day_change = sum(p['day_change'] for p in priced)
+        self.cost = sum(p['quantity'] * p['cost_basis'] for p in priced)
+
+    @property
+    def unrealized(self):
+        """Unrealized P&L of the positions with a quote"""
+        return self.market_value - self.cost
+
+
+def format_age(seconds):
+    """Format a duration as a short age string like '5m' or '2h'"""
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h"
+    return f"{seconds // 86400}d"
+
+
+class QuoteError(Exception):
+    """The provider answered without a usable quote (args[0] is the
+    get_stock_data error code)"""
+
+
+class QuoteProvider:
+    """Source of stock quotes behind get_stock_data
+
+    fetch() returns a dict with 'current_price', 'high' and 'low'.
+    Network problems are raised as OSError (which drives the circuit
+    breaker), malformed responses as ValueError and answers without a
+    quote as QuoteError.
+    """
+
+    name = None
+    requires_token = False
+
+    def fetch(self, symbol):
+        raise NotImplementedError
+
+
+class FinnhubProvider(QuoteProvider):
+    """Live quotes from the Finnhub REST API"""
+
+    name = 'finnhub'
+    requires_token = True
+    URL = "https://finnhub.io/api/v1/quote?token={token}&symbol={symbol}"
+
+    def __init__(self, token, timeout=10):
+        self.token = token
+        self.timeout = timeout
+
+    def fetch(self, symbol):
+        url = self.URL.format(token=self.token, symbol=symbol)
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            response_data = response.read().decode('utf-8')
+        return self.parse(json.loads(response_data))
+
+    @staticmethod
+    def parse(stock_data):
+        """Convert a Finnhub quote response"""
+        if 'c' not in stock_data:
+            raise QuoteError("invalid_response")
+        change = stock_data.get('d')
+        change_percent = stock_data.get('dp')
+        return {'current_price': float(stock_data['c']),
+                'high': float(stock_data.get('h', 0)),
+                'low': float(stock_data.get('l', 0)),
+                'open': float(stock_data.get('o') or 0) or None,
+                'previous_close': float(stock_data.get('pc') or 0) or None,
+                'change': None if change is None else float(change),
+                'change_percent': (None if change_percent is None
+                                   else float(change_percent)),
+                # Time of the quote on the server, None if unknown
+                'quote_time': int(stock_data.get('t') or 0) or None}
+
+
+class ReplayProvider(QuoteProvider):
+    """Replay quotes recorded in a file, for offline testing
+
+    Each line is either a Finnhub quote as JSON (optionally with a
+    "symbol" field, e.g. {"symbol": "NVDA", "c": 875.5, "h": 890.7,
+    "l": 860.2}) or a "timestamp: price" line as in the price history
+    file.  Every fetch returns the next recorded quote for the symbol;
+    lines without a symbol are served for any symbol.  The recording
+    starts over when it runs out, unless loop is False; quote times are
+    then shifted past the end of the previous pass.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, loop=True):
+        self.path = path
+        self.loop = loop
+        self.quotes = None  # symbol (or None) -> list of quotes
+        self.positions = {}
+        self.passes = {}  # Completed passes over the quotes, per symbol
+
+    def load(self):
+        self.quotes = {}
+        high = low = None  # Running range for plain price lines
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith('{'):
+                    record = json.loads(line)
+                    symbol = record.get('symbol')
+                    quote = FinnhubProvider.parse(record)
+                else:
+                    point = parse_history_line(line)
+                    if point is None:
+                        continue
+                    timestamp, price = point
+                    high = price if high is None else max(high, price)
+                    low = price if low is None else min(low, price)
+                    symbol = None
+                    quote = {'current_price': price,
+                             'high': high, 'low': low,
+                             'previous_close': None,
+                             'quote_time': timestamp}
+                self.quotes.setdefault(symbol, []).append(quote)
+
+    def symbols(self):
+        """Symbols with their own recorded quotes"""
+        if self.quotes is None:
+            self.load()
+        return sorted(s for s in self.quotes if s is not None)
+
+    def fetch(self, symbol):
+        if self.quotes is None:
+            self.load()
+        key = symbol if symbol in self.quotes else None
+        quotes = self.quotes.get(key)
+        if not quotes:
+            raise QuoteError("invalid_response")
+
+        position = self.positions.get(key, 0)
+        if position >= len(quotes):
+            if not self.loop:
+                raise QuoteError("invalid_response")
+            position = 0
+            self.passes[key] = self.passes.get(key, 0) + 1
+        self.positions[key] = position + 1
+
+        quote = dict(quotes[position])
+        times = [q['quote_time'] for q in (quotes[0], quotes[-1])]
+        if (self.passes.get(key) and quote['quote_time'] is not None and
+                None not in times):
+            # Later passes must look like new quotes
+            span = times[1] - times[0] + 1
+            quote['quote_time'] += self.passes[key] * span
+        return quote
+
+
+class SimulatedProvider(QuoteProvider):
+    """Synthetic random-walk quotes, for offline load testing
+
+    Every fetch moves the symbol's price by a lognormal step with the
+    given per-step volatility.  Symbols are independent and start at a
+    price derived from their name (also reported as the previous close),
+    so runs are reproducible with a seed.
+    """
+
+    name = 'simulated'
+
+    def __init__(self, volatility=0.002, seed=None):
+        self.volatility = volatility
+        self.random = random.Random(seed)
+        self.state = {}  # symbol -> [price, high, low]
+
+    def fetch(self, symbol):
+        state = self.state.get(symbol)
+        if state is None:
+            start = 20 + random.Random(symbol).random() * 480
+            state = self.state[symbol] = [start, start, start, start]
+        price = state[0] * math.exp(self.random.gauss(0, self.volatility))
+        state[0] = price
+        state[1] = max(state[1], price)
+        state[2] = min(state[2], price)
+        return {'current_price': price, 'high': state[1], 'low': state[2],
+                'previous_close': state[3]}
+
+
+def create_quote_provider(preferences):
+    """Create the quote provider selected in preferences"""
+    kind = preferences.get('quote_provider', 'finnhub')
+    if kind == 'replay':
+        return ReplayProvider(
+            os.path.expanduser(preferences.get('quote_source', '')))
+    if kind == 'simulated':
+        return SimulatedProvider()
+    return FinnhubProvider(preferences.get('api_token', ''))
+
+
+class SymbolDirectory:
+    """Searchable list of tradable symbols and their descriptions
+
+    Symbols and description words are kept in sorted arrays, so prefix
+    lookups are a bisect.  Single-typo matches use a map from each
+    symbol with one character deleted to the symbols it came from
+    (symmetric delete), so they are dictionary lookups as well.
+    """
+
+    URL = ("https://finnhub.io/api/v1/stock/symbol"
+           "?exchange={exchange}&token={token}")
+    MAX_AGE = 7 * 86400  # Refresh the cached directory weekly
+
+    def __init__(self, entries=(), fetched_at=0):
+        self.fetched_at = fetched_at
+        # symbol -> description, later entries win
+        directory = {symbol.upper(): description or ''
+                     for symbol, description in entries}
+        self.entries = sorted(directory.items())
+        self.symbols = [symbol for symbol, _ in self.entries]
+        self.words = sorted((word, index)
+                            for index, (_, description)
+                            in enumerate(self.entries)
+                            for word in set(description.upper().split()))
+        self.word_keys = [word for word, _ in self.words]
+        self.deletes = {}
+        for index, symbol in enumerate(self.symbols):
+            for i in range(len(symbol)):
+                self.deletes.setdefault(symbol[:i] + symbol[i + 1:],
+                                        []).append(index)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, symbol):
+        index = bisect.bisect_left(self.symbols, symbol)
+        return index < len(self.symbols) and self.symbols[index] == symbol
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.MAX_AGE
+
+    @staticmethod
+    def prefix_range(keys, prefix):
+        """Index range of the sorted keys starting with prefix"""
+        return (bisect.bisect_left(keys, prefix),
+                bisect.bisect_left(keys, prefix + '\uffff'))
+
+    @staticmethod
+    def typo_kind(query, symbol):
+        """0 if symbol is query with two neighbours swapped, 1 if with one
+        character replaced, None otherwise (both of the same length)"""
+        differ = [i for i, (a, b) in enumerate(zip(query, symbol)) if a != b]
+        if len(differ) == 1:
+            return 1
+        if (len(differ) == 2 and differ[1] == differ[0] + 1 and
+                query[differ[0]] == symbol[differ[1]] and
+                query[differ[1]] == symbol[differ[0]]):
+            return 0
+        return None
+
+    def search(self, text, limit=10):
+        """(symbol, description) matches for text, best first
+
+        Exact and prefix matches of the symbol come first, then symbols
+        one typo away, then descriptions with a word starting with text.
+        Typos rank swapped characters first, then a wrong character, then
+        a missing or extra one; then by length difference and symbol.
+        """
+        query = text.strip().upper()
+        results = []
+        if not query:
+            return results
+        seen = set()
+
+        def add(indexes):
+            for index in indexes:
+                if len(results) >= limit:
+                    return
+                if index not in seen:
+                    seen.add(index)
+                    results.append(self.entries[index])
+
+        low, high = self.prefix_range(self.symbols, query)
+        add(range(low, min(high, low + limit)))
+
+        if len(results) < limit:
+            typos = {}  # index -> kind of typo
+            for index in self.deletes.get(query, ()):
+                typos[index] = 2  # One character missing
+            for i in range(len(query)):
+                deleted = query[:i] + query[i + 1:]
+                if deleted in self:  # One character extra
+                    typos[bisect.bisect_left(self.symbols, deleted)] = 2
+                # Same length with a common deletion: swapped or wrong
+                for index in self.deletes.get(deleted, ()):
+                    kind = self.typo_kind(query, self.symbols[index])
+                    if kind is not None:
+                        typos[index] = kind
+            # Indexes are in symbol order
+            add(sorted(typos, key=lambda index: (
+                typos[index], abs(len(self.symbols[index]) - len(query)),
+                index)))
+
+        if len(results) < limit:
+            low, high = self.prefix_range(self.word_keys, query)
+            add(self.words[i][1] for i in range(low, high))
+        return results
+
+    @classmethod
+    def load(cls, path):
+        """Load a cached directory, None if there is none"""
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return cls(data['symbols'], data.get('fetched_at', 0))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        """Cache the directory in a file"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'fetched_at': self.fetched_at,
+                       'symbols': self.entries}, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def download(cls, token, exchange='US', timeout=30):
+        """Fetch all symbols of an exchange from Finnhub"""
+        url = cls.URL.format(exchange=exchange, token=token)
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            records = json.loads(response.read().decode('utf-8'))
+        return cls(((record['symbol'], record.get('description'))
+                    for record in records if record.get('symbol')),
+                   time.time())
+
+
+# Quote fields stored after the price in history lines, "-" if unknown
+HISTORY_FIELDS = ('open', 'high', 'low', 'previous_close')
+
+
+def format_history_line(timestamp, price, quote=None):
+    """Format a history line, with the HISTORY_FIELDS of quote if given"""
+    line = f"{timestamp}: {price}"
+    if quote:
+        for field in HISTORY_FIELDS:
+            value = quote.get(field)
+            line += " -" if value is None else f" {value}"
+    return line + "\n"
+
+
+def parse_history_line(line):
+    """Parse a "timestamp: price ..." history line, None if malformed"""
+    parts = line.split(': ')
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1].split(' ', 1)[0])
+    except ValueError:
+        return None
+
+
+def parse_history_fields(line):
+    """HISTORY_FIELDS stored in a history line, None if not stored"""
+    fields = dict.fromkeys(HISTORY_FIELDS)
+    values = line.split(': ', 1)[-1].split()[1:]
+    for field, value in zip(HISTORY_FIELDS, values):
+        try:
+            fields[field] = float(value)
+        except ValueError:
+            pass
+    return fields
+
+
+# Timestamp delta-of-delta encodings of archive blocks:
+# (prefix, prefix bits, bits)
+ARCHIVE_TIME_CODES = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12),
+                      (0b1111, 4, 64))
+# Most bits a point takes in a block: time and price at their longest
+ARCHIVE_MAX_POINT_BITS = (4 + 64) + (13 + 64)
+
+
+def encode_archive_block(points):
+    """Compress (timestamp_ms, price) points into a block (Gorilla)
+
+    Timestamps are stored as the change of the change of the previous
+    interval, which is zero for regular polling.  Prices are XORed with
+    the previous price and only the bits that differ are stored, in the
+    previous window of meaningful bits if they fit.
+    """
+    first_time, first_price = points[0]
+    previous_bits = struct.unpack('>Q', struct.pack('>d', first_price))[0]
+    data = bytearray()
+    # Bits not yet moved to data; kept short, so shifts stay cheap
+    bits = (first_time << 64) | previous_bits
+    size_bits = 128
+    previous_time = first_time
+    previous_delta = 0
+    window = None  # (leading, trailing) zero bits of the last XOR stored
+
+    for time_ms, price in points[1:]:
+        delta = time_ms - previous_time
+        change = delta - previous_delta
+        previous_time, previous_delta = time_ms, delta
+        if change == 0:
+            bits <<= 1
+            size_bits += 1
+        else:
+            for prefix, prefix_bits, width in ARCHIVE_TIME_CODES:
+                if -(1 << (width - 1)) <= change < (1 << (width - 1)):
+                    bits = ((((bits << prefix_bits) | prefix) << width) |
+                            (change & ((1 << width) - 1)))
+                    size_bits += prefix_bits + width
+                    break
+
+        value_bits = struct.unpack('>Q', struct.pack('>d', price))[0]
+        xor = value_bits ^ previous_bits
+        previous_bits = value_bits
+        if xor == 0:
+            bits <<= 1
+            size_bits += 1
+        else:
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if (window is not None and leading >= window[0] and
+                    trailing >= window[1]):
+                size = 64 - window[0] - window[1]
+                bits = (((bits << 2) | 0b10) << size) | (xor >> window[1])
+                size_bits += 2 + size
+            else:
+                size = 64 - leading - trailing
+                window = (leading, trailing)
+                bits = (((((bits << 2) | 0b11) << 11) |
+                         (leading << 6) | (size % 64)) << size) | (
+                             xor >> trailing)
+                size_bits += 13 + size
+
+        # Move whole bytes out
+        rest = size_bits & 7
+        data += (bits >> rest).to_bytes(size_bits >> 3, 'big')
+        bits &= (1 << rest) - 1
+        size_bits = rest
+
+    padding = -size_bits % 8
+    data += (bits << padding).to_bytes((size_bits + padding) >> 3, 'big')
+    return bytes(data)
+
+
+def decode_archive_block(data, count):
+    """Decompress a block into a list of (timestamp_ms, price) points"""
+    time_ms = int.from_bytes(data[0:8], 'big')
+    value_bits = int.from_bytes(data[8:16], 'big')
+    offset = 16  # Next byte of data to load
+    # Loaded bits not yet read, the next one is bit size_bits - 1
+    bits = size_bits = 0
+    delta = 0
+    leading = trailing = 0
+    points = [(time_ms, struct.unpack('>d', struct.pack('>Q', value_bits))[0])]
+
+    for _ in range(count - 1):
+        if size_bits < ARCHIVE_MAX_POINT_BITS:
+            # Load enough for a point, dropping the bits already read
+            chunk = data[offset:offset + 32]
+            offset += 32
+            bits = ((bits & ((1 << size_bits) - 1)) << (len(chunk) * 8) |
+                    int.from_bytes(chunk, 'big'))
+            size_bits += len(chunk) * 8
+
+        size_bits -= 1
+        if bits >> size_bits & 1:
+            # The prefix is 1 followed by up to three more 1 bits
+            ones = 1
+            while ones < len(ARCHIVE_TIME_CODES):
+                size_bits -= 1
+                if not bits >> size_bits & 1:
+                    break
+                ones += 1
+            width = ARCHIVE_TIME_CODES[ones - 1][2]
+            size_bits -= width
+            change = bits >> size_bits & ((1 << width) - 1)
+            if change >= 1 << (width - 1):
+                change -= 1 << width
+            delta += change
+        time_ms += delta
+
+        size_bits -= 1
+        if bits >> size_bits & 1:
+            size_bits -= 1
+            if bits >> size_bits & 1:
+                size_bits -= 11
+                header = bits >> size_bits & 0x7ff
+                leading = header >> 6
+                trailing = 64 - leading - ((header & 0x3f) or 64)
+            size = 64 - leading - trailing
+            size_bits -= size
+            value_bits ^= (bits >> size_bits & ((1 << size) - 1)) << trailing
+        points.append(
+            (time_ms, struct.unpack('>d', struct.pack('>Q', value_bits))[0]))
+    return points
+
+
+class HistoryArchive:
+    """Sealed price history in compressed blocks
+
+    The archive next to a history file (NVDA.txt -> NVDA.archive) holds
+    its older points in blocks of up to BLOCK_SIZE points, with times
+    in milliseconds.  Each block starts with a header giving its time
+    and price range, which serves as the index: range scans skip to the
+    blocks they need and decode only those.
+    """
+
+    MAGIC = b'STKARCH1'
+    # first_ms, last_ms, low, high, last price, points, data bytes
+    HEADER = struct.Struct('<qqdddII')
+    BLOCK_SIZE = 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = None  # Headers and data offsets, loaded on demand
+
+    @classmethod
+    def for_history(cls, data_file):
+        """The archive of a history file"""
+        return cls(os.path.splitext(data_file)[0] + '.archive')
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load_index(self):
+        """Read the block headers, return [(header..., data offset)]"""
+        self.blocks = []
+        if not self.exists():
+            return self.blocks
+        with open(self.path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{self.path} is not a history archive")
+            size = os.fstat(f.fileno()).st_size
+            offset = len(self.MAGIC)
+            while offset + self.HEADER.size <= size:
+                header = self.HEADER.unpack(f.read(self.HEADER.size))
+                data_offset = offset + self.HEADER.size
+                if data_offset + header[6] > size:
+                    break  # Interrupted write of the last block
+                self.blocks.append(header + (data_offset,))
+                offset = data_offset + header[6]
+                f.seek(offset)
+        return self.blocks
+
+    def get_blocks(self):
+        if self.blocks is None:
+            self.load_index()
+        return self.blocks
+
+    def last_ms(self):
+        """Time of the last archived point (milliseconds), None if empty"""
+        blocks = self.get_blocks()
+        return blocks[-1][1] if blocks else None
+
+    def append(self, points):
+        """Seal time ordered (timestamp, price) points into new blocks
+
+        Points at or before the last archived one are skipped.  Returns
+        the number of points archived.
+        """
+        blocks = self.get_blocks()
+        last_ms = self.last_ms()
+        end = (blocks[-1][7] + blocks[-1][6] if blocks
+               else len(self.MAGIC))
+        count = 0
+        with open(self.path, 'r+b' if self.exists() else 'w+b') as f:
+            # Drop what an interrupted write may have left behind
+            f.truncate(end)
+            f.seek(0)
+            f.write(self.MAGIC)
+            f.seek(end)
+            points = ((int(round(timestamp * 1000)), price)
+                      for timestamp, price in points)
+            if last_ms is not None:
+                points = (point for point in points if point[0] > last_ms)
+            for block in iter_batches(points, self.BLOCK_SIZE):
+                data = encode_archive_block(block)
+                prices = [price for _, price in block]
+                f.write(self.HEADER.pack(
+                    block[0][0], block[-1][0], min(prices), max(prices),
+                    prices[-1], len(block), len(data)))
+                f.write(data)
+                count += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+        self.blocks = None
+        return count
+
+    def iter_points(self, start=None, end=None):
+        """Stream (timestamp, price) points, in seconds
+
+        With start, blocks ending before it are skipped, except that the
+        last point before start is still yielded.  With end, blocks
+        starting after it are skipped.
+        """
+        blocks = self.get_blocks()
+        first = 0
+        if start is not None and blocks:
+            first = bisect.bisect_left([block[1] for block in blocks],
+                                       start * 1000)
+            if first > 0:
+                previous = blocks[first - 1]
+                yield previous[1] / 1000.0, previous[4]
+        if first >= len(blocks):
+            return
+        with open(self.path, 'rb') as f:
+            for block in blocks[first:]:
+                if end is not None and block[0] > end * 1000:
+                    return
+                f.seek(block[7])
+                for time_ms, price in decode_archive_block(
+                        f.read(block[6]), block[5]):
+                    yield time_ms / 1000.0, price
+
+
+def archive_history(data_file, keep=1440):
+    """Move all but the newest keep points of a history file to its archive
+
+    Points move in whole blocks, older than anything left in the file.
+    Returns the number of points archived.
+    """
+    archive = HistoryArchive.for_history(data_file)
+    total = sum(1 for _ in iter_history_lines(data_file))
+    sealed = (total - keep) // archive.BLOCK_SIZE * archive.BLOCK_SIZE
+    if sealed <= 0:
+        return 0
+
+    data_dir = os.path.dirname(data_file) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix='.price_history.')
+    try:
+        with open(data_file, 'rb') as f, os.fdopen(fd, 'wb') as temp:
+            def iter_points():
+                for line in f:
+                    point = parse_history_line(
+                        line.decode(errors='replace').strip())
+                    if point is not None:
+                        yield point, line
+
+            points = iter_points()
+            count = archive.append(
+                point for point, line in itertools.islice(points, sealed))
+            for point, line in points:
+                temp.write(line.rstrip(b'\n') + b'\n')
+            size = f.tell()
+        replace_history(data_file, temp_path, size)
+        temp_path = None
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+    return count
+
+
+def iter_history_file(path):
+    """Stream (timestamp, price) points from a history file
+
+    Points sealed in the file's archive come first.
+    """
+    archive = HistoryArchive.for_history(path)
+    sealed_ms = None
+    if archive.exists():
+        yield from archive.iter_points()
+        sealed_ms = archive.last_ms()
+    for point, line in iter_history_lines(path):
+        # Skip points left over from an interrupted archive run
+        if sealed_ms is None or round(point[0] * 1000) > sealed_ms:
+            yield point
+
+
+def iter_history_lines(path, size=None):
+    """Stream ((timestamp, price), line) of the valid lines of a file
+
+    With size, only the lines in the first size bytes are read.
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            if size is not None:
+                size -= len(line)
+                if size < 0:
+                    break
+            line = line.decode(errors='replace')
+            point = parse_history_line(line.strip())
+            if point is not None:
+                yield point, line
+
+
+def append_history_line(data_file, line):
+    """Append a line to a history file, holding its lock
+
+    Rewrites (import, archive) replace the file while holding the lock,
+    so once we have it, check we still have the file at data_file.
+    """
+    while True:
+        with open(data_file, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                current = os.path.samestat(os.fstat(f.fileno()),
+                                           os.stat(data_file))
+            except FileNotFoundError:
+                current = False
+            if current:
+                f.write(line)
+                return
+
+
+def history_size(data_file):
+    """Size of a history file, taken between appends"""
+    with open(data_file, 'rb') as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        return os.fstat(f.fileno()).st_size
+
+
+def replace_history(data_file, temp_path, size):
+    """Replace a history file by temp_path, a rewrite of its first size bytes
+
+    Lines appended after those (by a running applet) are copied to the end
+    of temp_path first, and the file stays locked until it is replaced,
+    so no append is lost.
+    """
+    with open(data_file, 'a+b') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(size)
+        tail = f.read()
+        if tail:
+            with open(temp_path, 'ab') as temp:
+                temp.write(tail)
+        os.replace(temp_path, data_file)
+
+
+def parse_symbol_list(text):
+    """Parse comma or space separated symbols, without duplicates"""
+    symbols = []
+    for symbol in text.replace(',', ' ').split():
+        symbol = symbol.strip().upper()
+        if symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+def load_bucketed_prices(path, bucket_seconds):
+    """Last price per time bucket (bucket number -> price) from a file"""
+    prices = {}
+    if os.path.exists(path):
+        for timestamp, price in iter_history_file(path):
+            if price > 0:
+                prices[int(timestamp // bucket_seconds)] = price
+    return prices
+
+
+def aligned_log_returns(prices_a, prices_b):
+    """Log returns of two symbols over the buckets both have prices for"""
+    common = sorted(prices_a.keys() & prices_b.keys())
+    returns_a = []
+    returns_b = []
+    for previous, bucket in zip(common, common[1:]):
+        returns_a.append(math.log(prices_a[bucket] / prices_a[previous]))
+        returns_b.append(math.log(prices_b[bucket] / prices_b[previous]))
+    return returns_a, returns_b
+
+
+def pearson(xs, ys):
+    """Pearson correlation, None if undefined"""
+    n = len(xs)
+    if n < 3:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x <= 0 or var_y <= 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def compute_drawdowns(prices):
+    """Maximum and current drawdown (fractions of the running peak)"""
+    peak = None
+    max_drawdown = 0.0
+    drawdown = 0.0
+    for price in prices:
+        if peak is None or price > peak:
+            peak = price
+        drawdown = (peak - price) / peak
+        max_drawdown = max(max_drawdown, drawdown)
+    return max_drawdown, drawdown
+
+
+def compute_analytics(history_files, benchmark, bucket_seconds, window,
+                      benchmark_file=None):
+    """Correlation matrix, volatility, beta and drawdowns of symbols
+
+    history_files maps symbols to their history files.  benchmark_file is
+    the benchmark's history if it isn't one of them.  Runs in a worker
+    process, so it only takes and returns plain data.  Volatility is the
+    standard deviation of the last window log returns, annualized with
+    the number of samples per year actually seen in the history.
+    """
+    symbols = list(history_files)
+    prices = {symbol: load_bucketed_prices(path, bucket_seconds)
+              for symbol, path in history_files.items()}
+    if benchmark_file and benchmark not in prices:
+        prices[benchmark] = load_bucketed_prices(benchmark_file,
+                                                 bucket_seconds)
+
+    stats = {}
+    for symbol in symbols:
+        buckets = sorted(prices[symbol])
+        series = [prices[symbol][bucket] for bucket in buckets]
+        returns = [math.log(b / a) for a, b in zip(series, series[1:])]
+        volatility = None
+        recent = returns[-window:]
+        if len(recent) >= 2:
+            mean = sum(recent) / len(recent)
+            variance = (sum((r - mean) ** 2 for r in recent) /
+                        (len(recent) - 1))
+            span_years = ((buckets[-1] - buckets[0]) * bucket_seconds /
+                          (365.25 * 86400))
+            periods_per_year = len(returns) / span_years
+            volatility = math.sqrt(variance * periods_per_year)
+
+        beta = None
+        if benchmark in prices and symbol != benchmark:
+            returns_s, returns_b = aligned_log_returns(prices[symbol],
+                                                       prices[benchmark])
+            if len(returns_b) >= 3:
+                mean_s = sum(returns_s) / len(returns_s)
+                mean_b = sum(returns_b) / len(returns_b)
+                cov = sum((s - mean_s) * (b - mean_b)
+                          for s, b in zip(returns_s, returns_b))
+                var = sum((b - mean_b) ** 2 for b in returns_b)
+                if var > 0:
+                    beta = cov / var
+        elif symbol == benchmark:
+            beta = 1.0
+
+        max_drawdown, drawdown = compute_drawdowns(series)
+        stats[symbol] = {'points': len(series), 'volatility': volatility,
+                         'beta': beta, 'max_drawdown': max_drawdown,
+                         'drawdown': drawdown}
+
+    correlation = [[1.0 if a == b else None for b in symbols]
+                   for a in symbols]
+    for i, a in enumerate(symbols):
+        for j in range(i + 1, len(symbols)):
+            value = pearson(*aligned_log_returns(prices[a],
+                                                 prices[symbols[j]]))
+            correlation[i][j] = correlation[j][i] = value
+
+    return {'symbols': symbols, 'stats': stats,
+            'correlation': correlation,
+            'benchmark_points': len(prices.get(benchmark, ())),
+            'computed_at': time.time()}
+
+
+def find_history_offset(f, start):
+    """Byte offset in a history file to read the points from start on
+
+    History files are appended in time order, so a binary search over
+    byte offsets finds the last point before start without reading the
+    whole file.  f must be opened in binary mode.
+    """
+    f.seek(0, os.SEEK_END)
+    low, high = 0, f.tell()  # low is always the start of a line
+    while high - low > 4096:
+        middle = (low + high) // 2
+        f.seek(middle)
+        f.readline()  # Skip to the next full line
+        offset = f.tell()
+        point = None
+        while point is None and offset < high:
+            line = f.readline()
+            if not line:
+                break
+            point = parse_history_line(line.decode(errors='replace').strip())
+            if point is None:
+                offset = f.tell()
+        if point is not None and offset < high and point[0] < start:
+            low = offset
+        else:
+            high = middle
+    return low
+
+
+def iter_history_since(path, start):
+    """Stream (timestamp, price) points from a history file
+
+    Starts with the last points before start, so callers know the price
+    at start, and skips most of the older history, including archive
+    blocks before start.
+    """
+    archive = HistoryArchive.for_history(path)
+    sealed_ms = None
+    if archive.exists():
+        yield from archive.iter_points(start)
+        sealed_ms = archive.last_ms()
+    with open(path, 'rb') as f:
+        f.seek(find_history_offset(f, start))
+        for line in f:
+            point = parse_history_line(line.decode(errors='replace').strip())
+            if point is not None and (
+                    sealed_ms is None or round(point[0] * 1000) > sealed_ms):
+                yield point
+
+
+def align_histories(history_files, start, end, columns):
+    """Percent change of symbols since start on a common time grid
+
+    The time from start to end is split into columns equal slots, and
+    each symbol's points are looked up into their slot by timestamp, so
+    no per-second arrays are built.  A symbol's value in a slot is its
+    last price up to the slot end, relative to its price at start (or
+    its first price after start); slots before its first price are None.
+    Files are streamed from start on, so memory use depends on symbols
+    and columns only, not on the length of the histories.
+
+    Returns a list of values per symbol, in history_files order.
+    """
+    columns = max(1, int(columns))
+    step = max(end - start, 1e-9) / columns
+    grid = []
+    last_column = -1
+    for path in history_files.values():
+        values = [None] * columns
+        base = None
+        known_at_start = False
+        if os.path.exists(path):
+            for timestamp, price in iter_history_since(path, start):
+                if timestamp > end:
+                    break
+                if price <= 0:
+                    continue
+                if timestamp < start:
+                    base = price  # Price at start, so far
+                    known_at_start = True
+                    continue
+                if base is None:
+                    base = price
+                column = min(int((timestamp - start) / step), columns - 1)
+                values[column] = (price / base - 1) * 100
+                last_column = max(last_column, column)
+        grid.append((values, known_at_start))
+
+    # Carry prices forward through slots without a point, up to the
+    # latest point of any symbol
+    result = []
+    for values, known_at_start in grid:
+        carried = 0.0 if known_at_start else None
+        for column in range(last_column + 1):
+            if values[column] is None:
+                values[column] = carried
+            else:
+                carried = values[column]
+        result.append(values)
+    return result
+
+
+def compute_comparison(history_files, days, columns):
+    """Align histories over the last days (0 for all), for the comparison
+
+    Runs in a worker process.  Returns (start, end, values per symbol).
+    """
+    end = time.time()
+    if days:
+        start = end - days * 86400
+    else:
+        # Everything: from the oldest point of any symbol
+        start = end
+        for path in history_files.values():
+            if os.path.exists(path):
+                for timestamp, price in iter_history_file(path):
+                    start = min(start, timestamp)
+                    break
+    return start, end, align_histories(history_files, start, end, columns)
+
+
+# Time ranges of the comparison window: (label, days, 0 for everything)
+COMPARISON_RANGES = (("1 Day", 1), ("1 Week", 7), ("1 Month", 30),
+                     ("1 Year", 365), ("All", 0))
+# Line colors of the compared symbols, the main symbol's comes first
+COMPARISON_COLORS = ((0.2, 0.8, 0.2), (0.3, 0.6, 1.0), (1.0, 0.6, 0.2),
+                     (0.9, 0.3, 0.9), (1.0, 0.9, 0.3), (0.3, 0.9, 0.9),
+                     (1.0, 0.4, 0.4), (0.7, 0.7, 0.7), (0.6, 0.4, 1.0),
+                     (0.6, 1.0, 0.6))
+
+
+class SeriesSnapshot(namedtuple('SeriesSnapshot', [
+        'symbol', 'version', 'count', 'timestamps', 'prices', 'info',
+        'stored_quote'])):
+    """State of a PriceSeries at one version, never changed once made
+
+    timestamps and prices are tuples of the most recent points; count is
+    the number of points added so far, including those dropped from the
+    front.  info and stored_quote dicts are replaced, never modified.
+    """
+
+    __slots__ = ()
+
+
+class PriceSeries:
+    """Price history of one symbol
+
+    The most recent max_points points are kept in memory for the charts,
+    the history file keeps all of them.  The in-memory state is published
+    as an immutable SeriesSnapshot: every change builds a new snapshot,
+    copying at most max_points points, and replaces the old one with a
+    single assignment.  Readers on any thread take series.snapshot once
+    and get a consistent view without locks.  Its version is bumped with
+    every change, so displays can tell which symbols need repainting.
+    """
+
+    def __init__(self, symbol, data_file, max_points=144):
+        self.symbol = symbol
+        self.data_file = data_file
+        self.max_points = max_points
+        self.snapshot = SeriesSnapshot(symbol, 0, 0, (), (), None, None)
+
+    def publish(self, **changes):
+        """Replace the snapshot with a new version with changed fields"""
+        self.snapshot = self.snapshot._replace(
+            version=self.snapshot.version + 1, **changes)
+
+    def load(self):
+        """Load the most recent points from the history file"""
+        if not os.path.exists(self.data_file):
+            self.publish()
+            return
+        timestamps = deque(maxlen=self.max_points)
+        prices = deque(maxlen=self.max_points)
+        count = 0
+        last_line = None
+        for (timestamp, price), line in iter_history_lines(self.data_file):
+            timestamps.append(timestamp)
+            prices.append(price)
+            count += 1
+            last_line = line
+        stored_quote = self.snapshot.stored_quote
+        if last_line is not None:
+            stored_quote = dict(parse_history_fields(last_line),
+                                current_price=prices[-1])
+        self.publish(count=self.snapshot.count + count,
+                     timestamps=tuple(timestamps), prices=tuple(prices),
+                     stored_quote=stored_quote)
+
+    def append(self, price, timestamp=None, quote=None, **changes):
+        """Add a point and append it to the history file
+
+        changes are other snapshot fields to publish along with it.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        old = self.snapshot
+        first = max(0, len(old.prices) + 1 - self.max_points)
+        self.publish(count=old.count + 1,
+                     timestamps=old.timestamps[first:] + (timestamp,),
+                     prices=old.prices[first:] + (price,), **changes)
+
+        append_history_line(self.data_file,
+                            format_history_line(timestamp, price, quote))
+
+    def add_quote(self, quote):
+        """Store a fetched quote as a point, unless it is already stored
+
+        Points are keyed by the server's quote time, so polling a quote
+        that hasn't changed (e.g. outside trading hours) stores nothing.
+        Without a quote time, a quote equal to the last stored one is
+        the same quote.  Returns True if a point was added.
+        """
+        stored = {field: quote.get(field)
+                  for field in ('current_price',) + HISTORY_FIELDS}
+        timestamps = self.snapshot.timestamps
+        timestamp = quote.get('quote_time')
+        if timestamp is not None:
+            if timestamps and timestamp <= timestamps[-1]:
+                return False
+        elif stored == self.snapshot.stored_quote:
+            return False
+
+        self.append(quote['current_price'], timestamp, quote,
+                    stored_quote=stored)
+        return True
+
+    def set_symbol(self, symbol):
+        """Rename the series (the main symbol was changed)"""
+        if symbol != self.symbol:
+            self.symbol = symbol
+            self.publish(symbol=symbol)
+
+    def set_info(self, info):
+        """Store the latest stock info, return True if it changed"""
+        if info == self.snapshot.info:
+            return False
+        self.publish(info=info)
+        return True
+
+
+# Quote fields served by the local API, besides symbol, price and time
+API_QUOTE_FIELDS = ('high', 'low', 'open', 'previous_close', 'change',
+                    'change_percent', 'quote_time')
+# Entries of an If-None-Match header: "*" or (possibly weak) entity tags
+ETAG_LIST_PATTERN = re.compile(r'\*|(?:W/)?("[^"]*")')
+
+
+def etag_matches(if_none_match, etag):
+    """Check whether an If-None-Match header lists etag (or is "*")
+
+    Weak tags (W/"...") match their strong counterparts, as the weak
+    comparison of If-None-Match requires.
+    """
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for match in ETAG_LIST_PATTERN.finditer(if_none_match or ''):
+        if match.group(0) == '*' or match.group(1) == etag:
+            return True
+    return False
+
+
+class QuoteApiHandler(http.server.BaseHTTPRequestHandler):
+    """Requests of the local API, served from the published snapshot
+
+    GET /quotes                 latest quotes of all symbols
+    GET /quotes/SYMBOL          latest quote of one symbol
+    GET /history/SYMBOL?start=&end=
+                                points in a time range, as NDJSON
+    """
+
+    server_version = "StockApplet"
+
+    def do_GET(self):
+        snapshot = self.server.api.snapshot  # Consistent for this request
+        url = urllib.parse.urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        if parts == ['quotes']:
+            self.send_json({'quotes': snapshot['quotes']}, snapshot['etag'])
+        elif len(parts) == 2 and parts[0] == 'quotes':
+            quote = snapshot['quotes'].get(parts[1].upper())
+            if quote is None:
+                self.send_error_json(404, "unknown symbol")
+            else:
+                self.send_json(quote, snapshot['etags'][quote['symbol']])
+        elif len(parts) == 2 and parts[0] == 'history':
+            self.send_history(snapshot, parts[1].upper(),
+                              urllib.parse.parse_qs(url.query))
+        else:
+            self.send_error_json(404, "not found")
+
+    def not_modified(self, etag):
+        """Answer 304 if the client has this version already"""
+        if not etag_matches(self.headers.get('If-None-Match'), etag):
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return True
+
+    def send_json(self, data, etag):
+        if self.not_modified(etag):
+            return
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, code, message):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_history(self, snapshot, symbol, query):
+        """Stream the points of a time range, one JSON object per line"""
+        data_file = snapshot['files'].get(symbol)
+        if data_file is None:
+            self.send_error_json(404, "unknown symbol")
+            return
+        try:
+            start = float(query.get('start', ['0'])[0])
+            end = float(query['end'][0]) if 'end' in query else None
+        except ValueError:
+            self.send_error_json(400, "start and end must be Unix times")
+            return
+
+        # The range only changes when the symbol gets new points
+        etag = f'"{snapshot["etags"][symbol][1:-1]}-{start}-{end}"'
+        if self.not_modified(etag):
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        if not os.path.exists(data_file):
+            return
+        lines = []
+        for timestamp, price in iter_history_since(data_file, start):
+            if end is not None and timestamp > end:
+                break
+            if timestamp >= start:
+                lines.append(json.dumps({'t': timestamp, 'price': price}))
+                if len(lines) >= 1000:
+                    self.wfile.write(("\n".join(lines) + "\n").encode())
+                    lines = []
+        if lines:
+            self.wfile.write(("\n".join(lines) + "\n").encode())
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else '-'
+
+    def log_message(self, format, *args):
+        pass  # Don't fill the session log with requests
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class QuoteApiServer:
+    """Opt-in local HTTP API over the applet's quotes and history
+
+    listen is "host:port" (or a port on 127.0.0.1) or the path of a
+    Unix socket.  Requests are served in background threads from an
+    immutable snapshot that the applet replaces with publish(), so they
+    never touch the applet's state.
+    """
+
+    def __init__(self, listen):
+        self.listen = listen
+        self.snapshot = {'quotes': {}, 'files': {}, 'etags': {},
+                         'etag': '"0"'}
+        if listen.startswith('/') or listen.startswith('~'):
+            self.socket_path = os.path.expanduser(listen)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # Left over from a crash
+            # Only the user may connect, from the moment the socket exists
+            old_umask = os.umask(0o177)
+            try:
+                self.server = UnixHTTPServer(self.socket_path,
+                                             QuoteApiHandler)
+            finally:
+                os.umask(old_umask)
+        else:
+            self.socket_path = None
+            host, _, port = listen.rpartition(':')
+            self.server = http.server.ThreadingHTTPServer(
+                (host or '127.0.0.1', int(port)), QuoteApiHandler)
+        self.server.api = self
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def publish(self, series_list):
+        """Make the current state of the price series available"""
+        quotes = {}
+        files = {}
+        etags = {}
+        for series in series_list:
+            snapshot = series.snapshot
+            info = snapshot.info
+            if not info or info.get('error'):
+                info = snapshot.stored_quote or {}
+            quote = {'symbol': series.symbol,
+                     'price': snapshot.prices[-1] if snapshot.prices else None,
+                     'time': (snapshot.timestamps[-1] if snapshot.timestamps
+                              else None),
+                     'stale': bool(info.get('stale'))}
+            for field in API_QUOTE_FIELDS:
+                quote[field] = info.get(field)
+            quotes[series.symbol] = quote
+            files[series.symbol] = series.data_file
+            etags[series.symbol] = f'"{series.symbol}-{snapshot.version}"'
+        key = repr(sorted(etags.items())).encode('utf-8')
+        self.snapshot = {'quotes': quotes, 'files': files, 'etags': etags,
+                         'etag': f'"{zlib.crc32(key):08x}"'}
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class StockApplet:
+    CONFIG_FILE = "~/.config/stock-applet.json"
+    DATA_FILE = "~/.local/share/mate-applets/stock-applet/price_history.txt"
+
+    def __init__(self, applet):
+        self.applet = applet
+        self.config_file = os.path.expanduser(self.CONFIG_FILE)
+        self.data_file = os.path.expanduser(self.DATA_FILE)
+        self.init_state()
 
         self.chart_window = None
+        self.chart_window_iconified = False
+        # The chart is painted once into chart_surface, mouse motion only
+        # repaints the crosshair drawn over it
+        self.chart_surface = None
+        self.chart_plot = ScrollingPlot()
+        # Painted (snapshot, x of first point, step, min, max)
+        self.chart_points = None
+        self.chart_hover_x = None  # Mouse x, None when not over the chart
+        self.chart_hover_index = None  # Point under the crosshair
+
+        # Display refreshes are coalesced per frame and skipped while
+        # nothing is visible
+        self.redraw = RedrawScheduler()
+        self.redraw.register('panel', self.refresh_panel,
+                             self.applet.get_mapped)
+        self.redraw.register('tooltip', self.update_tooltip,
+                             self.applet.get_mapped)
+        self.redraw.register('window', self.refresh_chart_window,
+                             self.is_chart_window_visible)
+        self.analytics_window = None
+        self.redraw.register('analytics', self.request_analytics,
+                             self.is_analytics_window_visible)
+        self.comparison_window = None
+        self.redraw.register('comparison', self.refresh_comparison_window,
+                             self.is_comparison_window_visible)
+        self.watch_screensaver()
 
         # Create container for switching between label and drawing area
         self.container = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
@@ -72,7 +1749,10 @@ class StockApplet:
 
         # Individual chart drawing areas
         self.chart_areas = {}
+        self.chart_plots = {}  # ScrollingPlot of each chart area
         self.create_chart_areas()
+        self.create_sparkline_grid()
+        self.create_ticker_tape()
 
         # Add appropriate widget based on preferences
         self.update_panel_display()
@@ -94,44 +1774,187 @@ class StockApplet:
 
         # Connect to size allocation changes to update chart dimensions
         self.applet.connect('size-allocate', self.on_applet_size_allocate)
+        # Catch up on changes made while the applet was not on screen
+        self.applet.connect('map', lambda widget: self.redraw.schedule())
 
         # Setup context menu
         self.setup_menu()
 
+        self.start_api_server()
         self.update_stock_info()
         # Update every 10 minutes by default (600 seconds)
         interval_minutes = self.preferences.get('update_interval', 10)
         self.timer_id = GLib.timeout_add_seconds(
             interval_minutes * 60, self.update_stock_info)
+        self.applet.connect('destroy', self.on_applet_destroy)
+
+    def on_applet_destroy(self, widget):
+        """Stop updates and background work when the applet is removed"""
+        GLib.source_remove(self.timer_id)
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server = None
+        if self.analytics_executor is not None:
+            # Don't wait for a running job, its result is of no use now
+            self.analytics_executor.shutdown(wait=False, cancel_futures=True)
+            self.analytics_executor = None
+
+    def init_state(self, preferences=None, read_config=True):
+        """Load preferences and price history, set up the quote source
+
+        preferences override the defaults and, with read_config, the
+        saved preferences.
+        """
+        # Load preferences
+        self.preferences = {
+            'show_current_price': True,
+            'show_daily_range': True,
+            'show_chart': False,
+            'stock_symbol': 'NVDA',
+            'api_token': '',
+            'update_interval': 10,  # minutes
+            'chart_width': 50,  # Width of each individual chart
+            'chart_transparency': 50,  # Chart fill transparency (0-100)
+            'chart_font_size': 10,  # Font size for chart labels
+            'chart_line_color': (0.2, 0.8, 0.2),  # RGB for line color (green)
+            'chart_fill_color': (0.2, 0.8, 0.2),  # RGB for fill color (green)
+            'chart_text_color': (1.0, 1.0, 1.0),  # RGB for text color (white)
+            'chart_background_color': (0.1, 0.1, 0.1),  # RGB for background
+            'show_symbol_on_chart': True,  # Show stock symbol on chart
+            'quote_provider': 'finnhub',  # finnhub, replay or simulated
+            'quote_source': '',  # Recorded quotes file for replay
+            'watchlist': [],  # Additional symbols for the sparkline grid
+            'show_sparkline_grid': False,  # Show all symbols as sparklines
+            'show_ticker_tape': False,  # Scroll all symbols through panel
+            'ticker_width': 200,  # Width of the ticker tape
+            'ticker_speed': 30,  # Ticker scrolling speed (pixels/second)
+            'ticker_max_fps': 30,  # Ticker frame rate limit
+            'ticker_cpu_budget': 2,  # Max CPU share for the ticker (%)
+            'benchmark_symbol': 'SPY',  # Benchmark for beta (analytics)
+            'volatility_window': 20,  # Returns per volatility estimate
+            'portfolio': {},  # symbol -> {'quantity', 'cost_basis'}
+            'show_portfolio': False,  # Show portfolio P&L in the label
+            'comparison_days': 7,  # Comparison time range (0 = all)
+            'api_listen': '',  # Local API address or socket, '' for none
+            'symbol_exchange': 'US'  # Exchange of the symbol directory
+        }
+        if read_config:
+            self.load_preferences()
+        if preferences:
+            self.preferences.update(preferences)
+
+        # Data storage for charts (last 144 data points = 24 hours
+        # at 10min intervals)
+        self.max_data_points = 144
+        self.series = PriceSeries(self.preferences['stock_symbol'],
+                                  self.data_file, self.max_data_points)
+
+        # Price history file
+        self.ensure_data_directory()
+        self.load_price_history()
 
-    def get_stock_data(self):
-        """Get stock price data from Finnhub API"""
+        # Additional symbols shown in the sparkline grid
+        self.watchlist = {}
+        self.load_watchlist()
+        self.grid_drawn_versions = {}  # symbol -> painted series version
+        self.portfolio = self.create_portfolio()
+
+        # Ticker tape animation state
+        self.ticker_items = {}  # symbol -> (key, surface, width)
+        self.ticker_offset = 0.0
+        self.ticker_drawn_offset = None
+        self.ticker_total_width = 0
+        self.ticker_last_frame_time = None
+        self.ticker_tick_id = None
+        self.ticker_budget = FrameBudget(
+            self.preferences['ticker_max_fps'],
+            self.preferences['ticker_cpu_budget'] / 100.0)
+
+        # Watchlist analytics, computed in a worker process
+        self.analytics_executor = None
+        self.analytics_key = None  # Inputs of the cached/pending result
+        self.analytics_result = None
+        self.analytics_pending = False
+
+        # Watchlist quotes are fetched on a worker thread, one batch at
+        # a time; without a main loop they are fetched right away
+        self.background_fetch = True
+        self.watchlist_fetching = False
+        self.watchlist_fetch_again = False
+
+        # Comparison overlay, aligned in the analytics worker process
+        self.comparison_key = None  # Inputs of the cached/pending result
+        self.comparison_result = None
+        self.comparison_pending = False
+
+        # Network failures open the breaker so outages don't cost a
+        # blocked request per tick; meanwhile the last good quote is shown
+        self.fetch_breaker = CircuitBreaker()
+        self.fetch_breaker.set_interval(
+            self.preferences['update_interval'] * 60)
+        self.last_good_info = None
+        self.last_good_time = None
+        snapshot = self.series.snapshot
+        if snapshot.prices:
+            self.last_good_info = dict(snapshot.stored_quote, error=None)
+            self.last_good_time = snapshot.timestamps[-1]
+
+        self.provider = create_quote_provider(self.preferences)
+        self.api_server = None  # Local read API, see start_api_server
+
+        # Known symbols for the preferences dialog, loaded on demand
+        self.symbol_directory = None
+        self.symbol_directory_loading = False
+        self.symbol_entries = {}  # Entries with completion -> their store
+
+    @property
+    def current_stock_info(self):
+        """Latest stock info of the main symbol, from its snapshot"""
+        return self.series.snapshot.info
+
+    def get_stock_data(self, symbol=None):
+        """Get stock price data from the configured quote provider"""
         data = {'current_price': 0.0, 'high': 0.0, 'low': 0.0, 'error': None}
 
         try:
-            if not self.preferences['api_token'] or \
-               self.preferences['api_token'].strip() == "":
+            if self.provider.requires_token and (
+                    not self.preferences['api_token'] or
+                    self.preferences['api_token'].strip() == ""):
                 data['error'] = "no_token"
                 return data
 
-            symbol = self.preferences['stock_symbol'] or "NVDA"
-            url = "https://finnhub.io/api/v1/quote?token=" + \
-                  f"{self.preferences['api_token']}&symbol={symbol}"
+            # Don't wait on a service that keeps failing
+            if not self.fetch_breaker.allow():
+                data['error'] = "circuit_open"
+                return data
+
+            symbol = symbol or self.preferences['stock_symbol'] or "NVDA"
 
             try:
-                with urllib.request.urlopen(url, timeout=10) as response:
-                    response_data = response.read().decode('utf-8')
-                    stock_data = json.loads(response_data)
-                    if 'c' in stock_data:
-                        data['current_price'] = float(stock_data['c'])
-                        data['high'] = float(stock_data.get('h', 0))
-                        data['low'] = float(stock_data.get('l', 0))
-                        return data
-                    else:
-                        data['error'] = "invalid_response"
-            except (urllib.error.URLError, urllib.error.HTTPError):
+                quote = self.provider.fetch(symbol)
+                self.fetch_breaker.record_success()
+                data.update(quote)
+                return data
+            except QuoteError as e:
+                self.fetch_breaker.record_success()
+                data['error'] = str(e)
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    # The service is up and refused this request (a bad
+                    # token, or 429 when over the rate limit)
+                    self.fetch_breaker.record_success()
+                    data['error'] = ("rate_limited" if e.code == 429
+                                     else f"http_{e.code}")
+                else:
+                    self.fetch_breaker.record_failure()
+                    data['error'] = "fetch_failed"
+            except (urllib.error.URLError, OSError):
+                # Includes timeouts and connection errors
+                self.fetch_breaker.record_failure()
                 data['error'] = "fetch_failed"
             except (json.JSONDecodeError, ValueError, KeyError):
+                # The service answered, just not with a usable quote
+                self.fetch_breaker.record_success()
                 data['error'] = "parse_error"
 
         except Exception as e:
@@ -164,77 +1987,366 @@ class StockApplet:
            self.preferences['show_daily_range']:
             parts.append(f"[{low:.2f}..{high:.2f}]")
 
+        if self.preferences['show_portfolio'] and self.portfolio.priced:
+            parts.append(
+                f"Value {format_money(self.portfolio.market_value)}")
+            parts.append(
+                f"Day {format_money(self.portfolio.day_change, True)}")
+            parts.append(
+                f"P&L {format_money(self.portfolio.unrealized, True)}")
+
         if not parts:
             return f"{symbol}: --"
 
         return " | ".join(parts) if len(parts) > 1 else parts[0]
 
+    def get_label_text(self, data):
+        """Build the panel label text for stock info data"""
+        if not data:
+            return "Stock: --"
+        if data.get('error') == "no_token":
+            return "Stock: No Token"
+        if data.get('error'):
+            return "Stock: Error"
+
+        stock_info = self.format_display(
+            current_price=data.get('current_price'),
+            high=data.get('high'),
+            low=data.get('low'))
+        symbol = self.preferences['stock_symbol'] or "STOCK"
+        if data.get('stale'):
+            age = format_age(time.time() - data['fetched_at'])
+            return f"{symbol}: {stock_info} ({age} ago)"
+        return f"{symbol}: {stock_info}"
+
     def update_stock_info(self):
         """Update stock information and refresh displays"""
-        # Get raw data and store for charts
-        data = self.get_stock_data()
+        self.apply_stock_data(self.get_stock_data())
+        self.update_watchlist()
+        self.publish_api_snapshot()
+        return True
 
-        # Store current stock info for chart scaling
-        self.current_stock_info = data
+    def start_api_server(self):
+        """(Re)start the local read API if one is configured"""
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server = None
+        listen = self.preferences['api_listen'].strip()
+        if not listen:
+            return
+        try:
+            self.api_server = QuoteApiServer(listen)
+        except (OSError, ValueError) as e:
+            print(f"Error starting local API on {listen}: {e}")
+            return
+        self.publish_api_snapshot()
 
-        # Save price data if we got valid data
-        if not data.get('error') and data.get('current_price') is not None:
-            self.save_price_data(data['current_price'])
+    def load_symbol_directory(self):
+        """Load (and refresh if old) the symbol directory in the background
 
-        # Update chart window if open
-        if self.chart_window and self.chart_window.get_visible():
-            self.chart_drawing_area.queue_draw()
+        The cached copy is used right away, a refresh replaces it when
+        the download finishes.
+        """
+        if self.symbol_directory_loading:
+            return
+        if self.symbol_directory and not self.symbol_directory.is_stale():
+            return
+        self.symbol_directory_loading = True
+        exchange = self.preferences['symbol_exchange']
+        path = os.path.join(os.path.dirname(self.data_file),
+                            f"symbols-{exchange}.json")
+        token = self.preferences['api_token'].strip()
+        online = self.provider.name == 'finnhub' and token
+
+        def load():
+            directory = self.symbol_directory or SymbolDirectory.load(path)
+            if directory:
+                GLib.idle_add(self.on_symbol_directory_loaded, directory,
+                              False)
+            if online and (directory is None or directory.is_stale()):
+                try:
+                    directory = SymbolDirectory.download(token, exchange)
+                    directory.save(path)
+                except Exception as e:
+                    print(f"Error downloading symbol directory: {e}")
+                    directory = None
+            GLib.idle_add(self.on_symbol_directory_loaded, directory, True)
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def on_symbol_directory_loaded(self, directory, done):
+        """Use a loaded or downloaded symbol directory"""
+        if directory:
+            self.symbol_directory = directory
+            # Entries typed into before the directory arrived
+            for entry, store in list(self.symbol_entries.items()):
+                self.on_symbol_entry_changed(entry, store)
+        if done:
+            self.symbol_directory_loading = False
+        return False
 
-        # Update panel display based on mode
-        if self.preferences['show_chart']:
+    def attach_symbol_completion(self, entry):
+        """Offer symbol directory matches while typing into entry"""
+        store = Gtk.ListStore(str, str)  # Symbol, description
+        completion = Gtk.EntryCompletion()
+        completion.set_model(store)
+        completion.set_text_column(0)
+        # The store only ever holds the directory's matches
+        completion.set_match_func(lambda *args: True)
+        description_cell = Gtk.CellRendererText()
+        completion.pack_start(description_cell, True)
+        completion.add_attribute(description_cell, 'text', 1)
+        entry.set_completion(completion)
+        entry.connect('changed', self.on_symbol_entry_changed, store)
+        self.symbol_entries[entry] = store
+        entry.connect('destroy',
+                      lambda widget: self.symbol_entries.pop(widget, None))
+
+    def on_symbol_entry_changed(self, entry, store):
+        """Update completions and flag symbols the directory doesn't know"""
+        store.clear()
+        directory = self.symbol_directory
+        symbol = entry.get_text().strip().upper()
+        unknown = False
+        if directory:
+            for match in directory.search(symbol):
+                store.append(list(match))
+            unknown = bool(symbol) and symbol not in directory
+        entry.set_icon_from_icon_name(Gtk.EntryIconPosition.SECONDARY,
+                                      'dialog-warning' if unknown else None)
+        entry.set_icon_tooltip_text(Gtk.EntryIconPosition.SECONDARY,
+                                    "Unknown symbol" if unknown else None)
+
+    def publish_api_snapshot(self):
+        """Hand the current quotes to the local API"""
+        if self.api_server:
+            self.api_server.publish(self.get_grid_series())
+
+    def get_history_file(self, symbol):
+        """History file of a symbol other than the main one"""
+        history_dir = os.path.join(os.path.dirname(self.data_file), 'history')
+        return os.path.join(history_dir, f"{symbol.replace(os.sep, '_')}.txt")
+
+    def load_watchlist(self):
+        """Create price series for the watchlist symbols"""
+        main_symbol = self.preferences['stock_symbol']
+        watchlist = {}
+        # Held symbols are watched too, their quotes drive the P&L
+        symbols = (self.preferences.get('watchlist', []) +
+                   list(self.preferences.get('portfolio', {})))
+        for symbol in symbols:
+            if symbol == main_symbol or symbol in watchlist:
+                continue
+            series = self.watchlist.get(symbol)
+            if series is None:
+                data_file = self.get_history_file(symbol)
+                series = PriceSeries(symbol, data_file, self.max_data_points)
+                try:
+                    os.makedirs(os.path.dirname(data_file), mode=0o755,
+                                exist_ok=True)
+                    series.load()
+                except Exception as e:
+                    print(f"Error loading {symbol} price history: {e}")
+            watchlist[symbol] = series
+        self.watchlist = watchlist
+
+    def create_portfolio(self):
+        """Create the portfolio, priced with the last known quotes"""
+        portfolio = Portfolio(self.preferences.get('portfolio', {}))
+        for series in self.get_grid_series():
+            snapshot = series.snapshot
+            if snapshot.prices:
+                info = snapshot.info or snapshot.stored_quote or {}
+                portfolio.apply_quote(series.symbol, snapshot.prices[-1],
+                                      info.get('previous_close'))
+        return portfolio
+
+    def update_watchlist(self):
+        """Fetch quotes for the watchlist symbols
+
+        The requests run on a worker thread and the quotes are applied
+        on the main loop, so slow responses don't block the panel.
+        """
+        symbols = list(self.watchlist)
+        if not symbols:
+            return
+        if not self.background_fetch:
+            self.apply_watchlist_data(self.fetch_watchlist(symbols))
+            return
+        if self.watchlist_fetching:
+            # Symbols may have changed, fetch again once this batch is in
+            self.watchlist_fetch_again = True
+            return
+
+        def fetch():
+            results = self.fetch_watchlist(symbols)
+            GLib.idle_add(self.on_watchlist_fetched, results)
+
+        self.watchlist_fetching = True
+        threading.Thread(target=fetch, daemon=True).start()
+
+    def fetch_watchlist(self, symbols):
+        """Fetch (symbol, data) for symbols, on any thread"""
+        return [(symbol, self.get_stock_data(symbol)) for symbol in symbols]
+
+    def on_watchlist_fetched(self, results):
+        """Apply watchlist quotes fetched on the worker thread"""
+        self.watchlist_fetching = False
+        self.apply_watchlist_data(results)
+        self.publish_api_snapshot()
+        if self.watchlist_fetch_again:
+            self.watchlist_fetch_again = False
+            self.update_watchlist()
+        return False
+
+    def apply_watchlist_data(self, results):
+        """Store fetched watchlist quotes and schedule display refreshes"""
+        changed = False
+        for symbol, data in results:
+            series = self.watchlist.get(symbol)
+            if series is None or data.get('error'):
+                continue  # Removed meanwhile, or keep the last good quote
+            changed = series.set_info(data) or changed
+            self.portfolio.apply_quote(series.symbol,
+                                       data.get('current_price'),
+                                       data.get('previous_close'))
+            if data.get('current_price') is not None:
+                try:
+                    changed = series.add_quote(data) or changed
+                except Exception as e:
+                    print(f"Error saving {series.symbol} price data: {e}")
+
+        if changed:
+            self.redraw.bump()
+
+    def apply_stock_data(self, data):
+        """Store fetched stock data and schedule display refreshes"""
+        if not data.get('error'):
+            self.last_good_info = data
+            self.last_good_time = time.time()
+        elif is_transient_error(data['error']) and self.last_good_info:
+            # Keep showing the last good quote, marked with its age
+            data = dict(self.last_good_info, stale=True,
+                        stale_error=data['error'],
+                        fetched_at=self.last_good_time)
+
+        # Identical quotes need no redraw (but a stale quote's age changes)
+        changed = self.series.set_info(data) or data.get('stale')
+
+        # Save price data if we got valid (fresh) data
+        if (not data.get('error') and not data.get('stale') and
+                data.get('current_price') is not None):
+            self.portfolio.apply_quote(self.series.symbol,
+                                       data['current_price'],
+                                       data.get('previous_close'))
+            if self.save_price_data(data):
+                changed = True
+
+        # Panel, chart window and tooltip are refreshed on the next frame,
+        # and only if they are visible
+        if changed:
+            self.redraw.bump()
+
+    def refresh_panel(self):
+        """Refresh the panel widget for the current display mode"""
+        if self.preferences['show_ticker_tape']:
+            # Changed quotes are picked up by the next animation frame
+            if self.ticker_tick_id is None:
+                self.ticker_area.queue_draw()
+        elif self.preferences['show_sparkline_grid']:
+            self.refresh_sparkline_grid()
+        elif self.preferences['show_chart']:
             for area in self.chart_areas.values():
                 area.queue_draw()
         else:
-            if data.get('error') == "no_token":
-                self.label.set_text("Stock: No Token")
-            elif data.get('error'):
-                self.label.set_text("Stock: Error")
-            else:
-                stock_info = self.format_display(
-                    current_price=data.get('current_price'),
-                    high=data.get('high'),
-                    low=data.get('low'))
-                symbol = self.preferences['stock_symbol'] or "STOCK"
-                self.label.set_text(f"{symbol}: {stock_info}")
-        # Update tooltip with comprehensive information
-        self.update_tooltip()
+            self.label.set_text(self.get_label_text(self.current_stock_info))
 
-        return True
+    def refresh_chart_window(self):
+        """Redraw the chart window"""
+        self.chart_surface = None  # Repaint the chart, not just the overlay
+        self.chart_drawing_area.queue_draw()
+
+    def is_chart_window_visible(self):
+        """Check whether the chart window is shown and not minimized"""
+        return (self.chart_window is not None and
+                self.chart_window.get_visible() and
+                not self.chart_window_iconified)
+
+    def watch_screensaver(self):
+        """Pause display refreshes while the session is locked"""
+        try:
+            self.screensaver = Gio.DBusProxy.new_for_bus_sync(
+                Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+                None, 'org.mate.ScreenSaver', '/org/mate/ScreenSaver',
+                'org.mate.ScreenSaver', None)
+            self.screensaver.connect('g-signal', self.on_screensaver_signal)
+        except Exception:
+            self.screensaver = None  # No screensaver on the session bus
+
+    def on_screensaver_signal(self, proxy, sender_name, signal_name, params):
+        """Handle screensaver lock/unlock"""
+        if signal_name == 'ActiveChanged':
+            self.redraw.set_suspended(bool(params.unpack()[0]))
+            self.update_ticker_animation()
 
     def update_tooltip(self):
         """Update tooltip with comprehensive price information"""
+        tooltip_text = self.build_tooltip_text()
+        self.label.set_tooltip_text(tooltip_text)
+
+        # Also update chart area tooltips
+        for chart_area in self.chart_areas.values():
+            chart_area.set_tooltip_text(tooltip_text)
+        self.grid_area.set_tooltip_text(tooltip_text)
+        self.ticker_area.set_tooltip_text(tooltip_text)
+
+    def build_tooltip_text(self):
+        """Build tooltip text with comprehensive price information"""
         tooltip_lines = []
         symbol = self.preferences['stock_symbol'] or "STOCK"
+        snapshot = self.series.snapshot  # One consistent view
+        info = snapshot.info
 
         # Current stock info (today's data)
-        if (self.current_stock_info and
-                not self.current_stock_info.get('error')):
-            current_price = self.current_stock_info.get('current_price')
-            daily_high = self.current_stock_info.get('high')
-            daily_low = self.current_stock_info.get('low')
+        if info and not info.get('error'):
+            current_price = info.get('current_price')
+            daily_high = info.get('high')
+            daily_low = info.get('low')
 
             tooltip_lines.append(f"Stock: {symbol}")
             if current_price is not None:
                 tooltip_lines.append(f"Current: ${current_price:.2f}")
 
+            change = info.get('change')
+            change_percent = info.get('change_percent')
+            if change is not None and change_percent is not None:
+                tooltip_lines.append(
+                    f"Change: {change:+.2f} ({change_percent:+.2f}%)")
+
             if daily_high is not None and daily_low is not None:
                 tooltip_lines.append(
                     f"Today's Range: ${daily_low:.2f} - ${daily_high:.2f}")
+
+            quote_time = info.get('quote_time')
+            if quote_time:
+                quote_time = time.strftime("%b %d %H:%M",
+                                           time.localtime(quote_time))
+                tooltip_lines.append(f"Quote Time: {quote_time}")
+
+            if info.get('stale'):
+                age = format_age(
+                    time.time() - info['fetched_at'])
+                tooltip_lines.append(f"Offline, last update {age} ago")
         else:
             tooltip_lines.append(f"Stock: {symbol}")
             tooltip_lines.append("No current data available")
 
         # Historical data from chart (shown period)
-        if self.timestamps and self.price_data:
+        if snapshot.timestamps and snapshot.prices:
             # Get valid data points with timestamps
             valid_data = []
             for i, (timestamp, price) in enumerate(
-                    zip(self.timestamps, self.price_data)):
+                    zip(snapshot.timestamps, snapshot.prices)):
                 if timestamp is not None and price is not None:
                     valid_data.append((timestamp, price))
 
@@ -270,12 +2382,31 @@ class StockApplet:
                     tooltip_lines.append(
                         f"Highest: ${max_price:.2f} ({max_time})")
 
-        tooltip_text = "\n".join(tooltip_lines)
-        self.label.set_tooltip_text(tooltip_text)
+        if self.portfolio.priced:
+            portfolio = self.portfolio
+            tooltip_lines.append("")
+            tooltip_lines.append(
+                f"Portfolio ({portfolio.priced} of "
+                f"{len(portfolio.positions)} positions priced):")
+            tooltip_lines.append(
+                f"Market Value: {format_money(portfolio.market_value)}")
+            tooltip_lines.append(
+                f"Day P&L: {format_money(portfolio.day_change, True)}")
+            tooltip_lines.append(
+                f"Unrealized P&L: {format_money(portfolio.unrealized, True)}")
+
+        if self.watchlist:
+            tooltip_lines.append("")
+            tooltip_lines.append("Watchlist:")
+            for series in self.watchlist.values():
+                prices = series.snapshot.prices
+                if prices:
+                    tooltip_lines.append(
+                        f"{series.symbol}: ${prices[-1]:.2f}")
+                else:
+                    tooltip_lines.append(f"{series.symbol}: --")
 
-        # Also update chart area tooltips
-        for chart_area in self.chart_areas.values():
-            chart_area.set_tooltip_text(tooltip_text)
+        return "\n".join(tooltip_lines)
 
     def ensure_data_directory(self):
         """Ensure the data directory exists"""
@@ -284,41 +2415,21 @@ class StockApplet:
             os.makedirs(data_dir, mode=0o755, exist_ok=True)
 
     def load_price_history(self):
-        """Load price history from file"""
+        """Load the most recent price history from file"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r') as f:
-                    lines = f.read().strip().split('\n')
-                    for line in lines:
-                        if line.strip():
-                            parts = line.split(': ')
-                            if len(parts) == 2:
-                                try:
-                                    timestamp = float(parts[0])
-                                    price = float(parts[1])
-                                    self.timestamps.append(timestamp)
-                                    self.price_data.append(price)
-                                except ValueError:
-                                    continue
+            self.series.load()
         except Exception as e:
             print(f"Error loading price history: {e}")
 
-    def save_price_data(self, price):
-        """Save new price data to file"""
+    def save_price_data(self, data):
+        """Save new price data to file, return True if it was new"""
         try:
-            timestamp = time.time()
-
-            # Add to memory
-            self.timestamps.append(timestamp)
-            self.price_data.append(price)
-
-            # Write all data to file
-            with open(self.data_file, 'w') as f:
-                for i in range(len(self.timestamps)):
-                    f.write(f"{self.timestamps[i]}: {self.price_data[i]}\n")
-
+            # The file keeps the full history, only new quotes are
+            # appended
+            return self.series.add_quote(data)
         except Exception as e:
             print(f"Error saving price data: {e}")
+            return False
 
     def load_preferences(self):
         """Load preferences from config file"""
@@ -348,6 +2459,16 @@ class StockApplet:
         chart_action.connect("activate", self.show_chart)
         action_group.add_action(chart_action)
 
+        analytics_action = Gtk.Action("Analytics", "Analytics",
+                                      "Show watchlist analytics", None)
+        analytics_action.connect("activate", self.show_analytics)
+        action_group.add_action(analytics_action)
+
+        compare_action = Gtk.Action("Compare", "Compare",
+                                    "Compare watchlist symbols", None)
+        compare_action.connect("activate", self.show_comparison)
+        action_group.add_action(compare_action)
+
         preferences_action = Gtk.Action("Preferences", "Preferences",
                                         "Configure Stock Applet", None)
         preferences_action.connect("activate", self.show_preferences)
@@ -355,6 +2476,8 @@ class StockApplet:
 
         menu_xml = '''
         <menuitem name="Chart" action="Chart" />
+        <menuitem name="Analytics" action="Analytics" />
+        <menuitem name="Compare" action="Compare" />
         <separator/>
         <menuitem name="Preferences" action="Preferences" />
         '''
@@ -363,6 +2486,9 @@ class StockApplet:
 
     def show_preferences(self, action):
         """Show preferences dialog"""
+        # Completions for the symbol fields, ready soon after opening
+        self.load_symbol_directory()
+
         dialog = Gtk.Dialog("Stock Applet Preferences", None,
                             Gtk.DialogFlags.MODAL |
                             Gtk.DialogFlags.DESTROY_WITH_PARENT)
@@ -395,9 +2521,64 @@ class StockApplet:
         self.symbol_entry.set_text(
             self.preferences.get('stock_symbol', 'NVDA'))
         self.symbol_entry.set_placeholder_text("e.g., NVDA, AAPL, TSLA")
+        self.attach_symbol_completion(self.symbol_entry)
         symbol_box.pack_start(self.symbol_entry, True, True, 0)
         content.pack_start(symbol_box, False, False, 0)
 
+        # Watchlist
+        watchlist_box = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        watchlist_label = Gtk.Label("Watchlist:")
+        watchlist_label.set_size_request(120, -1)
+        watchlist_box.pack_start(watchlist_label, False, False, 0)
+        self.watchlist_entry = Gtk.Entry()
+        self.watchlist_entry.set_text(
+            ", ".join(self.preferences.get('watchlist', [])))
+        self.watchlist_entry.set_placeholder_text("e.g., AAPL, MSFT, AMD")
+        watchlist_box.pack_start(self.watchlist_entry, True, True, 0)
+        content.pack_start(watchlist_box, False, False, 0)
+
+        # Benchmark for analytics
+        benchmark_box = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        benchmark_label = Gtk.Label("Benchmark:")
+        benchmark_label.set_size_request(120, -1)
+        benchmark_box.pack_start(benchmark_label, False, False, 0)
+        self.benchmark_entry = Gtk.Entry()
+        self.benchmark_entry.set_text(
+            self.preferences.get('benchmark_symbol', 'SPY'))
+        self.benchmark_entry.set_placeholder_text(
+            "Symbol for beta, e.g., SPY")
+        self.attach_symbol_completion(self.benchmark_entry)
+        benchmark_box.pack_start(self.benchmark_entry, True, True, 0)
+        content.pack_start(benchmark_box, False, False, 0)
+
+        # Portfolio positions
+        positions_box = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        positions_label = Gtk.Label("Positions:")
+        positions_label.set_size_request(120, -1)
+        positions_box.pack_start(positions_label, False, False, 0)
+        self.positions_entry = Gtk.Entry()
+        self.positions_entry.set_text(
+            format_positions(self.preferences.get('portfolio', {})))
+        self.positions_entry.set_placeholder_text(
+            "symbol:quantity@cost, e.g., NVDA:10@450, AAPL:5@170")
+        positions_box.pack_start(self.positions_entry, True, True, 0)
+        content.pack_start(positions_box, False, False, 0)
+
+        # Local read API
+        api_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        api_label = Gtk.Label("Local API:")
+        api_label.set_size_request(120, -1)
+        api_box.pack_start(api_label, False, False, 0)
+        self.api_listen_entry = Gtk.Entry()
+        self.api_listen_entry.set_text(self.preferences.get('api_listen', ''))
+        self.api_listen_entry.set_placeholder_text(
+            "Off; e.g., 127.0.0.1:8765 or ~/.cache/stock-applet.sock")
+        api_box.pack_start(self.api_listen_entry, True, True, 0)
+        content.pack_start(api_box, False, False, 0)
+
         # Update Interval
         interval_box = Gtk.Box(
             orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
@@ -425,6 +2606,10 @@ class StockApplet:
             self.preferences['show_daily_range'])
         content.pack_start(self.daily_range_check, False, False, 0)
 
+        self.portfolio_check = Gtk.CheckButton("Show Portfolio P&L")
+        self.portfolio_check.set_active(self.preferences['show_portfolio'])
+        content.pack_start(self.portfolio_check, False, False, 0)
+
         # Add separator
         separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
         content.pack_start(separator, False, False, 5)
@@ -434,6 +2619,32 @@ class StockApplet:
         self.chart_view_check.set_active(self.preferences['show_chart'])
         content.pack_start(self.chart_view_check, False, False, 0)
 
+        grid_text = "Show Watchlist as Sparkline Grid in Panel"
+        self.sparkline_grid_check = Gtk.CheckButton(grid_text)
+        self.sparkline_grid_check.set_active(
+            self.preferences['show_sparkline_grid'])
+        content.pack_start(self.sparkline_grid_check, False, False, 0)
+
+        ticker_text = "Show Watchlist as Scrolling Ticker in Panel"
+        self.ticker_tape_check = Gtk.CheckButton(ticker_text)
+        self.ticker_tape_check.set_active(
+            self.preferences['show_ticker_tape'])
+        content.pack_start(self.ticker_tape_check, False, False, 0)
+
+        # Ticker speed control
+        ticker_speed_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL,
+                                   spacing=10)
+        ticker_speed_label = Gtk.Label("Ticker Speed (pixels/s):")
+        ticker_speed_box.pack_start(ticker_speed_label, False, False, 0)
+
+        self.ticker_speed_spin = Gtk.SpinButton()
+        self.ticker_speed_spin.set_range(5, 200)
+        self.ticker_speed_spin.set_increments(5, 20)
+        self.ticker_speed_spin.set_value(self.preferences['ticker_speed'])
+        ticker_speed_box.pack_start(self.ticker_speed_spin, False, False, 0)
+
+        content.pack_start(ticker_speed_box, False, False, 0)
+
         # Chart width control
         width_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL,
                             spacing=10)
@@ -537,6 +2748,26 @@ class StockApplet:
 
         content.pack_start(text_color_box, False, False, 0)
 
+        # Chart background color control
+        background_color_box = Gtk.Box(
+            orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        background_color_label = Gtk.Label("Chart Background:")
+        background_color_box.pack_start(background_color_label,
+                                        False, False, 0)
+
+        self.chart_background_color_button = Gtk.ColorButton()
+        background_color = self.preferences['chart_background_color']
+        rgba = Gdk.RGBA()
+        rgba.red = background_color[0]
+        rgba.green = background_color[1]
+        rgba.blue = background_color[2]
+        rgba.alpha = 1.0
+        self.chart_background_color_button.set_rgba(rgba)
+        background_color_box.pack_start(
+            self.chart_background_color_button, False, False, 0)
+
+        content.pack_start(background_color_box, False, False, 0)
+
         # Show symbol on chart checkbox
         self.show_symbol_check = Gtk.CheckButton("Show stock symbol on chart")
         self.show_symbol_check.set_active(
@@ -549,23 +2780,43 @@ class StockApplet:
         if response == Gtk.ResponseType.OK:
             # Save preferences
             old_chart_mode = self.preferences['show_chart']
-            old_chart_width = self.preferences['chart_width']
-            old_transparency = self.preferences['chart_transparency']
-            old_font_size = self.preferences['chart_font_size']
             old_interval = self.preferences['update_interval']
+            old_token = self.preferences['api_token']
+            old_symbol = self.preferences['stock_symbol']
+            old_grid_mode = self.preferences['show_sparkline_grid']
+            old_ticker_mode = self.preferences['show_ticker_tape']
+            old_watchlist = list(self.preferences['watchlist'])
+            old_portfolio = dict(self.preferences['portfolio'])
+            old_api_listen = self.preferences['api_listen']
 
             # Save new values
             self.preferences['api_token'] = self.token_entry.get_text().strip()
             self.preferences['stock_symbol'] = \
                 self.symbol_entry.get_text().strip().upper()
+            self.preferences['watchlist'] = \
+                parse_symbol_list(self.watchlist_entry.get_text())
+            self.preferences['benchmark_symbol'] = \
+                self.benchmark_entry.get_text().strip().upper()
+            self.preferences['portfolio'] = \
+                parse_positions(self.positions_entry.get_text())
+            self.preferences['api_listen'] = \
+                self.api_listen_entry.get_text().strip()
             self.preferences['update_interval'] = \
                 int(self.interval_spin.get_value())
             self.preferences['show_current_price'] = \
                 self.current_price_check.get_active()
             self.preferences['show_daily_range'] = \
                 self.daily_range_check.get_active()
+            self.preferences['show_portfolio'] = \
+                self.portfolio_check.get_active()
             # self.preferences['show_chart'] =
             #   self.chart_view_check.get_active()
+            self.preferences['show_sparkline_grid'] = \
+                self.sparkline_grid_check.get_active()
+            self.preferences['show_ticker_tape'] = \
+                self.ticker_tape_check.get_active()
+            self.preferences['ticker_speed'] = \
+                int(self.ticker_speed_spin.get_value())
             self.preferences['chart_width'] = \
                 int(self.chart_width_spin.get_value())
             self.preferences['chart_transparency'] = \
@@ -586,6 +2837,11 @@ class StockApplet:
             self.preferences['chart_text_color'] = (
                 text_rgba.red, text_rgba.green, text_rgba.blue)
 
+            background_rgba = self.chart_background_color_button.get_rgba()
+            self.preferences['chart_background_color'] = (
+                background_rgba.red, background_rgba.green,
+                background_rgba.blue)
+
             self.preferences['show_symbol_on_chart'] = \
                 self.show_symbol_check.get_active()
 
@@ -595,27 +2851,409 @@ class StockApplet:
             if old_interval != self.preferences['update_interval']:
                 self.restart_timer()
 
+            self.series.set_symbol(self.preferences['stock_symbol'])
+            if (old_watchlist != self.preferences['watchlist'] or
+                    old_portfolio != self.preferences['portfolio'] or
+                    old_symbol != self.preferences['stock_symbol']):
+                self.load_watchlist()
+                self.portfolio = self.create_portfolio()
+                self.update_watchlist()
+
+            if old_api_listen != self.preferences['api_listen']:
+                self.start_api_server()
+            else:
+                self.publish_api_snapshot()
+
+            # Settings may change every grid cell and ticker item
+            self.grid_drawn_versions.clear()
+            self.ticker_items.clear()
+
             # Switch display mode if chart preference changed
-            if old_chart_mode != self.preferences['show_chart']:
+            if (old_chart_mode != self.preferences['show_chart'] or
+                    old_grid_mode != self.preferences['show_sparkline_grid'] or
+                    old_ticker_mode != self.preferences['show_ticker_tape']):
                 self.update_panel_display()
-            # Update chart size if width changed
-            elif (old_chart_width != self.preferences['chart_width'] or
-                  old_transparency != self.preferences['chart_transparency'] or
-                  old_font_size != self.preferences['chart_font_size']):
-                if self.preferences['show_chart']:
-                    for area in self.chart_areas.values():
-                        area.queue_draw()
-
-            # Update display immediately
-            self.update_stock_info()
+            self.update_chart_dimensions()
+
+            # Only a new token or symbol needs a fetch, other settings
+            # just change how the current data is displayed
+            if (old_token != self.preferences['api_token'] or
+                    old_symbol != self.preferences['stock_symbol']):
+                # Give the new settings a fresh chance right away
+                self.fetch_breaker.record_success()
+                if old_symbol != self.preferences['stock_symbol']:
+                    self.last_good_info = None
+                self.provider = create_quote_provider(self.preferences)
+                self.update_stock_info()
+            else:
+                self.redraw.bump()
 
         dialog.destroy()
 
+    def show_analytics(self, action):
+        """Show the watchlist analytics window"""
+        if self.analytics_window:
+            self.analytics_window.present()
+            return
+
+        self.analytics_window = Gtk.Window()
+        self.analytics_window.set_title("Stock Analytics")
+        self.analytics_window.set_default_size(500, 300)
+        self.analytics_window.set_position(Gtk.WindowPosition.CENTER)
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        content.set_border_width(10)
+        self.analytics_status = Gtk.Label("Computing...")
+        self.analytics_status.set_halign(Gtk.Align.START)
+        content.pack_start(self.analytics_status, False, False, 0)
+
+        self.analytics_stats_grid = Gtk.Grid(column_spacing=15, row_spacing=4)
+        content.pack_start(self.analytics_stats_grid, False, False, 0)
+
+        correlation_label = Gtk.Label()
+        correlation_label.set_markup("<b>Correlation</b>")
+        correlation_label.set_halign(Gtk.Align.START)
+        content.pack_start(correlation_label, False, False, 0)
+
+        self.analytics_correlation_grid = Gtk.Grid(column_spacing=15,
+                                                   row_spacing=4)
+        content.pack_start(self.analytics_correlation_grid, False, False, 0)
+
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.add(content)
+        self.analytics_window.add(scrolled)
+        self.analytics_window.connect('delete-event',
+                                      self.on_chart_window_delete)
+        # Recompute (if data changed) whenever the window is shown
+        self.analytics_window.connect(
+            'map', lambda widget: self.redraw.mark_dirty('analytics'))
+        self.analytics_window.show_all()
+        self.update_analytics_pane()
+
+    def is_analytics_window_visible(self):
+        """Check whether the analytics window is shown"""
+        return (self.analytics_window is not None and
+                self.analytics_window.get_visible())
+
+    def request_analytics(self):
+        """Start an analytics run unless the cached result is current"""
+        series_list = self.get_grid_series()
+        history_files = {s.symbol: s.data_file for s in series_list}
+        benchmark = self.preferences['benchmark_symbol']
+        # Beta needs the benchmark's history even if it isn't watched
+        benchmark_file = benchmark_mtime = None
+        if benchmark and benchmark not in history_files:
+            benchmark_file = self.get_history_file(benchmark)
+            try:
+                benchmark_mtime = os.path.getmtime(benchmark_file)
+            except OSError:
+                benchmark_file = None
+        key = (tuple((s.symbol, s.snapshot.version) for s in series_list),
+               benchmark, benchmark_mtime,
+               self.preferences['update_interval'],
+               self.preferences['volatility_window'])
+        if key == self.analytics_key:
+            return  # Cached result (or the pending one) is up to date
+        if self.analytics_pending:
+            return  # Picked up again when the running job finishes
+
+        self.analytics_key = key
+        self.analytics_pending = True
+        future = self.get_worker_pool().submit(
+            compute_analytics, history_files, benchmark,
+            self.preferences['update_interval'] * 60,
+            self.preferences['volatility_window'], benchmark_file)
+        # Done callbacks run on an executor thread, hand over to GTK
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self.on_analytics_done, f))
+
+    def get_worker_pool(self):
+        """Worker process for the analytics and comparison jobs"""
+        if self.analytics_executor is None:
+            # Spawn instead of fork: the panel process runs GTK threads
+            self.analytics_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self.analytics_executor
+
+    def on_analytics_done(self, future):
+        """Show a finished analytics result"""
+        self.analytics_pending = False
+        try:
+            self.analytics_result = future.result()
+        except Exception as e:
+            print(f"Error computing analytics: {e}")
+            self.analytics_key = None
+            self.analytics_result = None
+        self.update_analytics_pane()
+        # Data may have changed while the job was running
+        self.redraw.mark_dirty('analytics')
+        return False
+
+    def update_analytics_pane(self):
+        """Fill the analytics window from the cached result"""
+        if not self.analytics_window:
+            return
+        for grid in (self.analytics_stats_grid,
+                     self.analytics_correlation_grid):
+            for child in grid.get_children():
+                child.destroy()
+
+        result = self.analytics_result
+        if not result:
+            self.analytics_status.set_text(
+                "Computing..." if self.analytics_pending
+                else "No data available")
+            return
+
+        computed = time.strftime("%H:%M:%S",
+                                 time.localtime(result['computed_at']))
+        self.analytics_status.set_text(
+            f"Computed at {computed}, beta against "
+            f"{self.preferences['benchmark_symbol']}")
+
+        def cell(grid, text, column, row, bold=False):
+            label = Gtk.Label()
+            if bold:
+                label.set_markup(f"<b>{GLib.markup_escape_text(text)}</b>")
+            else:
+                label.set_text(text)
+            label.set_halign(Gtk.Align.END)
+            grid.attach(label, column, row, 1, 1)
+
+        def percent(value):
+            return "--" if value is None else f"{value * 100:.1f}%"
+
+        no_beta = ("--" if result['benchmark_points']
+                   else "n/a (no benchmark data)")
+
+        headers = ["Symbol", "Points", "Volatility", "Beta",
+                   "Max Drawdown", "Drawdown"]
+        for column, header in enumerate(headers):
+            cell(self.analytics_stats_grid, header, column, 0, bold=True)
+        for row, symbol in enumerate(result['symbols'], start=1):
+            stats = result['stats'][symbol]
+            beta = stats['beta']
+            values = [symbol, str(stats['points']),
+                      percent(stats['volatility']),
+                      no_beta if beta is None else f"{beta:.2f}",
+                      percent(-stats['max_drawdown']),
+                      percent(-stats['drawdown'])]
+            for column, value in enumerate(values):
+                cell(self.analytics_stats_grid, value, column, row,
+                     bold=(column == 0))
+
+        symbols = result['symbols']
+        for i, symbol in enumerate(symbols, start=1):
+            cell(self.analytics_correlation_grid, symbol, i, 0, bold=True)
+            cell(self.analytics_correlation_grid, symbol, 0, i, bold=True)
+        for i, row in enumerate(result['correlation'], start=1):
+            for j, value in enumerate(row, start=1):
+                cell(self.analytics_correlation_grid,
+                     "--" if value is None else f"{value:.2f}", j, i)
+
+        self.analytics_window.show_all()
+
+    def show_comparison(self, action):
+        """Show the symbol comparison window"""
+        if self.comparison_window:
+            self.comparison_window.present()
+            return
+
+        self.comparison_window = Gtk.Window()
+        self.comparison_window.set_title("Stock Comparison")
+        self.comparison_window.set_default_size(600, 400)
+        self.comparison_window.set_position(Gtk.WindowPosition.CENTER)
+
+        content = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        range_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        range_box.set_border_width(5)
+        range_label = Gtk.Label("Range:")
+        range_combo = Gtk.ComboBoxText()
+        for label, days in COMPARISON_RANGES:
+            range_combo.append(str(days), label)
+        range_combo.set_active_id(str(self.preferences['comparison_days']))
+        range_combo.connect('changed', self.on_comparison_range_changed)
+        range_box.pack_start(range_label, False, False, 0)
+        range_box.pack_start(range_combo, False, False, 0)
+        content.pack_start(range_box, False, False, 0)
+
+        self.comparison_drawing_area = Gtk.DrawingArea()
+        self.comparison_drawing_area.connect('draw', self.on_comparison_draw)
+        content.pack_start(self.comparison_drawing_area, True, True, 0)
+
+        self.comparison_window.add(content)
+        self.comparison_window.connect('delete-event',
+                                       self.on_chart_window_delete)
+        self.comparison_window.show_all()
+
+    def is_comparison_window_visible(self):
+        """Check whether the comparison window is shown"""
+        return (self.comparison_window is not None and
+                self.comparison_window.get_visible())
+
+    def refresh_comparison_window(self):
+        """Redraw the comparison window"""
+        self.comparison_drawing_area.queue_draw()
+
+    def on_comparison_range_changed(self, combo):
+        """Switch the comparison time range"""
+        self.preferences['comparison_days'] = int(combo.get_active_id())
+        self.save_preferences()
+        self.comparison_drawing_area.queue_draw()
+
+    def on_comparison_draw(self, widget, cr):
+        """Draw the comparison chart"""
+        allocation = widget.get_allocation()
+        self.paint_comparison(cr, allocation.width, allocation.height)
+
+    def get_comparison(self, columns):
+        """Aligned percent changes of all symbols, columns slots wide
+
+        Returns (symbols, start, end, columns, values per symbol), or None
+        before the first result.  Aligning long histories takes a while,
+        so it runs in the worker process when a symbol gets new data or
+        the range changes; meanwhile the last result is returned.
+        """
+        series_list = self.get_grid_series()
+        days = self.preferences['comparison_days']
+        key = (tuple((s.symbol, s.snapshot.version) for s in series_list),
+               days, columns)
+        if key == self.comparison_key or self.comparison_pending:
+            return self.comparison_result  # Redrawn when the job finishes
+
+        history_files = {s.symbol: s.data_file for s in series_list}
+        self.comparison_key = key
+        self.comparison_pending = True
+        future = self.get_worker_pool().submit(
+            compute_comparison, history_files, days, columns)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self.on_comparison_done, f,
+                                    list(history_files), columns))
+        return self.comparison_result
+
+    def on_comparison_done(self, future, symbols, columns):
+        """Show a finished comparison result"""
+        self.comparison_pending = False
+        try:
+            start, end, values = future.result()
+            self.comparison_result = (symbols, start, end, columns, values)
+        except Exception as e:
+            print(f"Error aligning price histories: {e}")
+        # Inputs may have changed while the job was running
+        if self.is_comparison_window_visible():
+            self.comparison_drawing_area.queue_draw()
+        return False
+
+    def paint_comparison(self, cr, width, height):
+        """Paint all symbols as percent change since the range start"""
+        cr.set_source_rgb(*self.preferences['chart_background_color'])
+        cr.paint()
+
+        margin_left = 60
+        margin_right = 20
+        margin_top = 20
+        margin_bottom = 40
+        chart_width = width - margin_left - margin_right
+        chart_height = height - margin_top - margin_bottom
+        columns = max(2, int(chart_width))
+
+        result = self.get_comparison(columns)
+        if result:
+            # May still be aligned for another width, until the new one
+            symbols, start, end, columns, values = result
+            known = [v for line in values for v in line if v is not None]
+        text_color = self.preferences['chart_text_color']
+        cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
+                            cairo.FONT_WEIGHT_NORMAL)
+
+        if not result or not known:
+            cr.set_source_rgb(1, 1, 1)
+            cr.set_font_size(16)
+            text = "Computing..." if not result else "No data in this range"
+            text_extents = cr.text_extents(text)
+            cr.move_to((width - text_extents.width) / 2, height / 2)
+            cr.show_text(text)
+            return
+
+        # Scale always includes the 0% line
+        min_val = min(min(known), 0.0)
+        max_val = max(max(known), 0.0)
+        padding = max(max_val - min_val, 1.0) * 0.05
+        min_val -= padding
+        max_val += padding
+
+        def value_y(value):
+            return (margin_top + chart_height -
+                    chart_height * (value - min_val) / (max_val - min_val))
+
+        # Grid with percent labels
+        cr.set_line_width(1)
+        cr.set_font_size(10)
+        for i in range(0, 6):
+            y = margin_top + (chart_height * i / 5)
+            cr.set_source_rgb(0.3, 0.3, 0.3)
+            cr.move_to(margin_left, y)
+            cr.line_to(margin_left + chart_width, y)
+            cr.stroke()
+            value = max_val - (max_val - min_val) * i / 5
+            cr.set_source_rgb(*text_color)
+            cr.move_to(5, y + 4)
+            cr.show_text(f"{value:+.1f}%")
+
+        cr.set_source_rgb(0.6, 0.6, 0.6)
+        cr.move_to(margin_left, value_y(0.0))
+        cr.line_to(margin_left + chart_width, value_y(0.0))
+        cr.stroke()
+
+        # Range start and end below the chart
+        time_format = "%H:%M" if end - start <= 86400 else "%Y-%m-%d"
+        cr.set_source_rgb(*text_color)
+        cr.move_to(margin_left, height - margin_bottom / 2)
+        cr.show_text(time.strftime(time_format, time.localtime(start)))
+        text = time.strftime(time_format, time.localtime(end))
+        text_extents = cr.text_extents(text)
+        cr.move_to(margin_left + chart_width - text_extents.width,
+                   height - margin_bottom / 2)
+        cr.show_text(text)
+
+        # One line per symbol, with gaps before its first price
+        cr.set_line_width(2)
+        step = chart_width / (columns - 1)
+        for index, line in enumerate(values):
+            cr.set_source_rgb(
+                *COMPARISON_COLORS[index % len(COMPARISON_COLORS)])
+            drawing = False
+            for column, value in enumerate(line):
+                if value is None:
+                    drawing = False
+                    continue
+                x = margin_left + step * column
+                if drawing:
+                    cr.line_to(x, value_y(value))
+                else:
+                    cr.move_to(x, value_y(value))
+                    drawing = True
+            cr.stroke()
+
+        # Legend with the latest change of each symbol
+        for index, (symbol, line) in enumerate(zip(symbols, values)):
+            legend_y = margin_top + 10 + index * 15
+            cr.set_source_rgb(
+                *COMPARISON_COLORS[index % len(COMPARISON_COLORS)])
+            cr.rectangle(margin_left + 10, legend_y - 4, 15, 3)
+            cr.fill()
+            latest = next((v for v in reversed(line) if v is not None), None)
+            text = symbol if latest is None else f"{symbol} {latest:+.2f}%"
+            cr.set_source_rgb(*text_color)
+            cr.move_to(margin_left + 30, legend_y)
+            cr.show_text(text)
+
     def restart_timer(self):
         """Restart the update timer with new interval"""
         if hasattr(self, 'timer_id') and self.timer_id:
             GLib.source_remove(self.timer_id)
         interval_minutes = self.preferences.get('update_interval', 10)
+        self.fetch_breaker.set_interval(interval_minutes * 60)
         self.timer_id = GLib.timeout_add_seconds(
             interval_minutes * 60, self.update_stock_info)
 
@@ -633,11 +3271,29 @@ class StockApplet:
         # Create drawing area
         self.chart_drawing_area = Gtk.DrawingArea()
         self.chart_drawing_area.connect('draw', self.on_chart_draw)
+        self.chart_drawing_area.add_events(Gdk.EventMask.POINTER_MOTION_MASK |
+                                           Gdk.EventMask.LEAVE_NOTIFY_MASK)
+        self.chart_drawing_area.connect('motion-notify-event',
+                                        self.on_chart_motion)
+        self.chart_drawing_area.connect('leave-notify-event',
+                                        self.on_chart_leave)
 
         self.chart_window.add(self.chart_drawing_area)
         self.chart_window.connect('delete-event', self.on_chart_window_delete)
+        self.chart_window.connect('window-state-event',
+                                  self.on_chart_window_state)
+        # Catch up on changes made while the window was hidden
+        self.chart_window.connect('map', lambda widget: self.redraw.schedule())
         self.chart_window.show_all()
 
+    def on_chart_window_state(self, window, event):
+        """Track minimizing of the chart window"""
+        self.chart_window_iconified = bool(
+            event.new_window_state & Gdk.WindowState.ICONIFIED)
+        if not self.chart_window_iconified:
+            self.redraw.schedule()
+        return False
+
     def on_chart_window_delete(self, window, event):
         """Handle chart window close"""
         window.hide()
@@ -646,14 +3302,137 @@ class StockApplet:
     def on_chart_draw(self, widget, cr):
         """Draw the charts"""
         allocation = widget.get_allocation()
-        width = allocation.width
-        height = allocation.height
+        width, height = allocation.width, allocation.height
+        if (self.chart_surface is None or
+                (self.chart_surface.get_width(),
+                 self.chart_surface.get_height()) != (width, height)):
+            self.chart_surface = cr.get_target().create_similar_image(
+                cairo.FORMAT_RGB24, width, height)
+            self.paint_chart(cairo.Context(self.chart_surface), width, height,
+                             self.chart_plot)
+            # Points moved, keep the crosshair under the mouse
+            self.chart_hover_index = self.find_chart_point(self.chart_hover_x)
+
+        cr.set_source_surface(self.chart_surface, 0, 0)
+        cr.paint()
+        self.paint_crosshair(cr, width, height)
+
+    def find_chart_point(self, x):
+        """Index of the painted point nearest to screen x, None if none"""
+        if x is None or self.chart_points is None:
+            return None
+        snapshot, first_x, step = self.chart_points[:3]
+        if step == 0:
+            return None  # All points at the same x, nothing to pick
+        index = round((x - first_x) / step)
+        return max(0, min(index, len(snapshot.prices) - 1))
+
+    def get_chart_point(self, index):
+        """Screen x and y, timestamp and price of a painted point"""
+        snapshot, first_x, step, min_val, max_val = self.chart_points
+        left, top, plot_width, plot_height = self.chart_plot_area
+        price = snapshot.prices[index]
+        if max_val > min_val:
+            normalized = (price - min_val) / (max_val - min_val)
+        else:
+            normalized = 0.5
+        y = top + plot_height - (plot_height * normalized)
+        return first_x + index * step, y, snapshot.timestamps[index], price
+
+    def get_crosshair_areas(self, index, width, height):
+        """Rectangles (x, y, width, height) covered by the crosshair"""
+        left, top, plot_width, plot_height = self.chart_plot_area
+        x, y = self.get_chart_point(index)[:2]
+        label_x, label_y, label_width, label_height = \
+            self.get_crosshair_label_rect(x, y, width, height)
+        return [(int(x) - 3, int(top) - 1, 7, int(plot_height) + 3),
+                (int(left) - 1, int(y) - 4, int(plot_width) + 3, 9),
+                (int(label_x) - 1, int(label_y) - 1,
+                 int(label_width) + 3, int(label_height) + 3)]
+
+    def get_crosshair_label_rect(self, x, y, width, height):
+        """Readout box next to the crosshair, kept inside the window"""
+        label_width = 170
+        label_height = self.preferences['chart_font_size'] + 10
+        label_x = x + 10
+        if label_x + label_width > width:
+            label_x = x - 10 - label_width
+        label_y = max(0, min(y - label_height - 10, height - label_height))
+        return label_x, label_y, label_width, label_height
+
+    def on_chart_motion(self, widget, event):
+        """Move the crosshair to the point nearest to the mouse"""
+        self.chart_hover_x = event.x
+        index = self.find_chart_point(event.x)
+        if index != self.chart_hover_index:
+            self.move_crosshair(widget, index)
+        return False
+
+    def on_chart_leave(self, widget, event):
+        """Hide the crosshair"""
+        self.chart_hover_x = None
+        self.move_crosshair(widget, None)
+        return False
 
+    def move_crosshair(self, widget, index):
+        """Repaint only the old and the new crosshair areas"""
+        width = widget.get_allocated_width()
+        height = widget.get_allocated_height()
+        areas = []
+        for old_or_new in (self.chart_hover_index, index):
+            if old_or_new is not None:
+                areas.extend(self.get_crosshair_areas(old_or_new,
+                                                      width, height))
+        self.chart_hover_index = index
+        for area in areas:
+            widget.queue_draw_area(*area)
+
+    def paint_crosshair(self, cr, width, height):
+        """Paint the crosshair and the time and price readout"""
+        index = self.chart_hover_index
+        if index is None:
+            return
+        left, top, plot_width, plot_height = self.chart_plot_area
+        x, y, timestamp, price = self.get_chart_point(index)
+        text_color = self.preferences['chart_text_color']
+
+        cr.set_source_rgba(*text_color, 0.6)
+        cr.set_line_width(1)
+        cr.move_to(int(x) + 0.5, top)
+        cr.line_to(int(x) + 0.5, top + plot_height)
+        cr.move_to(left, int(y) + 0.5)
+        cr.line_to(left + plot_width, int(y) + 0.5)
+        cr.stroke()
+        cr.arc(x, y, 3, 0, 2 * math.pi)
+        cr.fill()
+
+        label_x, label_y, label_width, label_height = \
+            self.get_crosshair_label_rect(x, y, width, height)
+        cr.set_source_rgba(*self.preferences['chart_background_color'], 0.85)
+        cr.rectangle(label_x, label_y, label_width, label_height)
+        cr.fill()
+        cr.set_source_rgb(*text_color)
+        cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
+                            cairo.FONT_WEIGHT_NORMAL)
+        cr.set_font_size(self.preferences['chart_font_size'])
+        cr.move_to(label_x + 5, label_y + label_height - 5)
+        moment = time.strftime("%b %d %H:%M:%S", time.localtime(timestamp))
+        cr.show_text(f"{moment}  ${price:.2f}")
+
+    def paint_chart(self, cr, width, height, plot=None):
+        """Paint the chart window contents onto a cairo context
+
+        With a ScrollingPlot, only points added since its last paint are
+        drawn if the scale is unchanged.
+        """
+        self.chart_points = None  # Set once points are painted
+        snapshot = self.series.snapshot  # One consistent view
+        info = snapshot.info
         # Clear background
-        cr.set_source_rgb(0.1, 0.1, 0.1)
+        cr.set_source_rgb(*self.preferences['chart_background_color'])
         cr.paint()
 
-        if not self.timestamps or len(self.timestamps) < 2:
+        if len(snapshot.timestamps) < 2:
             # No data yet
             cr.set_source_rgb(1, 1, 1)
             cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
@@ -673,26 +3452,27 @@ class StockApplet:
 
         chart_width = width - margin_left - margin_right
         chart_height = height - margin_top - margin_bottom
+        self.chart_plot_area = (margin_left, margin_top,
+                                chart_width, chart_height)
 
         # Draw enabled charts
         charts_to_draw = []
-        if self.preferences['show_current_price'] and len(self.price_data) > 0:
+        if self.preferences['show_current_price'] and snapshot.prices:
             # Calculate dynamic min/max combining historical data
             # and daily high/low
-            prices = [p for p in self.price_data if p is not None]
+            prices = [p for p in snapshot.prices if p is not None]
             if prices:
                 min_price = min(prices)
                 max_price = max(prices)
 
                 # Include daily high/low from current stock info if available
-                if (self.current_stock_info and
-                        not self.current_stock_info.get('error')):
-                    if self.current_stock_info.get('low') is not None:
+                if info and not info.get('error'):
+                    if info.get('low') is not None:
                         min_price = min(
-                            min_price, self.current_stock_info['low'])
-                    if self.current_stock_info.get('high') is not None:
+                            min_price, info['low'])
+                    if info.get('high') is not None:
                         max_price = max(
-                            max_price, self.current_stock_info['high'])
+                            max_price, info['high'])
 
                 # Add some padding (5%) to avoid touching chart edges
                 price_range = max_price - min_price
@@ -704,7 +3484,7 @@ class StockApplet:
                 max_price += padding
 
                 line_color = self.preferences['chart_line_color']
-                charts_to_draw.append(('Stock Price ($)', self.price_data,
+                charts_to_draw.append(('Stock Price ($)', snapshot.prices,
                                        line_color, max_price, min_price))
 
         if not charts_to_draw:
@@ -761,18 +3541,14 @@ class StockApplet:
                 cr.move_to(5, y + 4)
                 cr.show_text(f"${price_value:.2f}")
 
-        # Draw charts
+        # Draw charts, unless the window is too small to hold any
         for name, data, line_color, max_val, min_val in charts_to_draw:
-            if not any(d is not None for d in data):
-                continue
-
-            valid_points = [(i, val) for i, val in enumerate(data)
-                            if val is not None]
-            if len(valid_points) < 2:
+            if len(data) < 2 or chart_width <= 0 or chart_height <= 0:
                 continue
 
             # Calculate transparency alpha value (0-1)
             alpha = self.preferences['chart_transparency'] / 100.0
+            fill_color = self.preferences['chart_fill_color']
 
             # Handle case where all values are the same
             # (avoid division by zero)
@@ -781,60 +3557,41 @@ class StockApplet:
                 # draw a horizontal line in the middle
                 max_val = min_val + (min_val * 0.01 if min_val > 0 else 0.01)
 
-            # Draw filled area
-            fill_color = self.preferences['chart_fill_color']
-            cr.set_source_rgba(*fill_color, alpha)
-            first_point = True
-            for i, value in valid_points:
-                x = margin_left + (chart_width * i / (len(data) - 1))
-                # Normalize value between min_val and max_val
-                normalized_value = (value - min_val) / (max_val - min_val)
-                y = margin_top + chart_height - \
-                    (chart_height * normalized_value)
-
-                if first_point:
-                    cr.move_to(x, y)
-                    first_point = False
-                else:
-                    cr.line_to(x, y)
-
-            # Close the path by drawing to bottom corners
-            if valid_points:
-                last_x = margin_left + (
-                    chart_width * (len(data) - 1) / (len(data) - 1))
-                first_x = margin_left
-                cr.line_to(last_x, margin_top + chart_height)
-                cr.line_to(first_x, margin_top + chart_height)
-                cr.close_path()
-                cr.fill()
-
-            # Draw line border
-            cr.set_source_rgb(*line_color)
-            cr.set_line_width(2)
-            first_point = True
-            for i, value in valid_points:
-                x = margin_left + (chart_width * i / (len(data) - 1))
-                # Use same normalization for price charts
-                prices = [v for v in data if v is not None]
-                if prices:
-                    min_val = min(prices)
-                    max_val = max(prices)
-                    if max_val > min_val:
-                        normalized = (value - min_val) / \
-                            (max_val - min_val)
+            # The line is scaled to the prices alone, the filled area to
+            # the prices and the daily range
+            line_min = min(data)
+            line_max = max(data)
+            bottom = margin_top + chart_height
+
+            def paint_run(cr, run):
+                points = []
+                for x, value in run:
+                    normalized_value = (value - min_val) / (max_val - min_val)
+                    fill_y = bottom - (chart_height * normalized_value)
+                    if line_max > line_min:
+                        normalized = (value - line_min) / \
+                            (line_max - line_min)
                     else:
                         normalized = 0.5
-                    y = margin_top + chart_height - (chart_height * normalized)
-                else:
-                    y = margin_top + chart_height / 2
-
-                if first_point:
-                    cr.move_to(x, y)
-                    first_point = False
-                else:
-                    cr.line_to(x, y)
-
-            cr.stroke()
+                    points.append((x, fill_y,
+                                   bottom - (chart_height * normalized)))
+                paint_plot_run(cr, points, bottom, (*fill_color, alpha),
+                               line_color, 2)
+
+            if plot is None:
+                step = chart_width / (len(data) - 1)
+                paint_run(cr, [(margin_left + i * step, value)
+                               for i, value in enumerate(data)])
+                first_x = margin_left
+            else:
+                key = (snapshot.symbol, min_val, max_val, line_min,
+                       line_max, fill_color, alpha, line_color)
+                first_x, step = plot.paint(cr, self.chart_plot_area, key,
+                                           snapshot.count, data,
+                                           paint_run)
+            # Screen positions for the crosshair lookup
+            self.chart_points = (snapshot, first_x, step, line_min,
+                                 line_max)
 
         # Draw legend
         legend_y = margin_top + 10
@@ -923,15 +3680,292 @@ class StockApplet:
         for chart_area in self.chart_areas.values():
             chart_area.set_size_request(chart_width, -1)
 
+        # The sparkline grid grows by a column per rows-worth of symbols
+        if hasattr(self, 'grid_area'):
+            cells = self.layout_sparkline_grid(
+                len(self.get_grid_series()),
+                self.applet.get_allocated_height())
+            grid_width = int(max(x + w for x, y, w, h in cells))
+            if self.grid_area.get_size_request()[0] != grid_width:
+                self.grid_area.set_size_request(grid_width, -1)
+
+    def create_sparkline_grid(self):
+        """Create the drawing area showing all symbols as sparklines"""
+        self.grid_area = Gtk.DrawingArea()
+        self.grid_area.set_has_tooltip(True)
+        self.grid_area.set_vexpand(True)
+        self.grid_area.set_valign(Gtk.Align.FILL)
+        self.grid_area.connect('draw', self.draw_sparkline_grid)
+        self.update_chart_dimensions()
+
+    def get_grid_series(self):
+        """Series in the sparkline grid: main symbol, then watchlist"""
+        return [self.series] + list(self.watchlist.values())
+
+    def layout_sparkline_grid(self, count, height):
+        """Cell rectangles (x, y, width, height) for count symbols
+
+        Cells fill columns top to bottom with as many rows as fit into
+        the panel height.
+        """
+        cell_width = self.preferences['chart_width']
+        min_cell_height = self.preferences['chart_font_size'] + 12
+        rows = max(1, min(count, int(height // min_cell_height)))
+        cell_height = max(1, height) / rows
+        return [((i // rows) * cell_width, (i % rows) * cell_height,
+                 cell_width, cell_height) for i in range(max(1, count))]
+
+    def refresh_sparkline_grid(self):
+        """Queue repaints of the grid cells whose symbol changed"""
+        series_list = self.get_grid_series()
+        if set(self.grid_drawn_versions) != {s.symbol for s in series_list}:
+            self.grid_area.queue_draw()
+            return
+
+        cells = self.layout_sparkline_grid(
+            len(series_list), self.grid_area.get_allocated_height())
+        for series, (x, y, w, h) in zip(series_list, cells):
+            if (self.grid_drawn_versions[series.symbol] !=
+                    series.snapshot.version):
+                self.grid_area.queue_draw_area(
+                    int(x), int(y), int(math.ceil(w)), int(math.ceil(h)))
+
+    def draw_sparkline_grid(self, widget, cr):
+        """Draw the sparkline grid"""
+        allocation = widget.get_allocation()
+        self.paint_sparkline_grid(cr, allocation.width, allocation.height)
+
+    def paint_sparkline_grid(self, cr, width, height):
+        """Paint sparklines and labels of all symbols in a single pass
+
+        Only cells inside the cairo clip (the area queued for repainting)
+        are painted.  Font and drawing settings are shared by all cells.
+        """
+        series_list = self.get_grid_series()
+        cells = self.layout_sparkline_grid(len(series_list), height)
+        clip_x1, clip_y1, clip_x2, clip_y2 = cr.clip_extents()
+
+        # Clear background (cairo limits this to the clip)
+        cr.set_source_rgb(*self.preferences['chart_background_color'])
+        cr.paint()
+
+        font_size = self.preferences['chart_font_size']
+        cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
+                            cairo.FONT_WEIGHT_BOLD)
+        cr.set_font_size(font_size - 1)
+        cr.set_line_width(1)
+        line_color = self.preferences['chart_line_color']
+        fill_color = self.preferences['chart_fill_color']
+        text_color = self.preferences['chart_text_color']
+        alpha = self.preferences['chart_transparency'] / 100.0
+
+        for series, (x, y, w, h) in zip(series_list, cells):
+            if (x + w <= clip_x1 or x >= clip_x2 or
+                    y + h <= clip_y1 or y >= clip_y2):
+                continue
+            snapshot = series.snapshot  # One consistent view
+            self.grid_drawn_versions[series.symbol] = snapshot.version
+
+            # Cell border
+            cr.set_source_rgb(0.3, 0.3, 0.3)
+            cr.rectangle(x + 0.5, y + 0.5, w - 1, h - 1)
+            cr.stroke()
+
+            prices = snapshot.prices
+            if len(prices) >= 2:
+                low = min(prices)
+                price_range = max(prices) - low
+                left = x + 2
+                top = y + font_size + 1
+                bottom = y + h - 2
+                step = (w - 4) / (len(prices) - 1)
+
+                for i, price in enumerate(prices):
+                    if price_range > 0:
+                        normalized = (price - low) / price_range
+                    else:
+                        normalized = 0.5
+                    point_y = bottom - (bottom - top) * normalized
+                    if i == 0:
+                        cr.move_to(left, point_y)
+                    else:
+                        cr.line_to(left + step * i, point_y)
+
+                # Same path for the line and the filled area
+                line_path = cr.copy_path()
+                cr.line_to(left + step * (len(prices) - 1), bottom)
+                cr.line_to(left, bottom)
+                cr.close_path()
+                cr.set_source_rgba(*fill_color, alpha)
+                cr.fill()
+                cr.append_path(line_path)
+                cr.set_source_rgb(*line_color)
+                cr.stroke()
+
+            # Symbol and latest price
+            if prices:
+                text = f"{series.symbol} {prices[-1]:.1f}"
+            else:
+                text = series.symbol
+            cr.set_source_rgb(*text_color)
+            cr.move_to(x + 3, y + font_size)
+            cr.show_text(text)
+
+    def create_ticker_tape(self):
+        """Create the drawing area for the scrolling ticker tape"""
+        self.ticker_area = Gtk.DrawingArea()
+        self.ticker_area.set_size_request(self.preferences['ticker_width'], -1)
+        self.ticker_area.set_has_tooltip(True)
+        self.ticker_area.set_vexpand(True)
+        self.ticker_area.set_valign(Gtk.Align.FILL)
+        self.ticker_area.connect('draw', self.draw_ticker_tape)
+        # The animation only runs while the ticker is on screen
+        self.ticker_area.connect_after(
+            'map', lambda widget: self.update_ticker_animation())
+        self.ticker_area.connect_after(
+            'unmap', lambda widget: self.update_ticker_animation())
+
+    def update_ticker_animation(self):
+        """Start or stop the ticker animation as needed"""
+        running = (self.preferences['show_ticker_tape'] and
+                   self.ticker_area.get_mapped() and
+                   not self.redraw.suspended)
+        if running and self.ticker_tick_id is None:
+            self.ticker_last_frame_time = None
+            self.ticker_tick_id = self.ticker_area.add_tick_callback(
+                self.on_ticker_tick)
+        elif not running and self.ticker_tick_id is not None:
+            self.ticker_area.remove_tick_callback(self.ticker_tick_id)
+            self.ticker_tick_id = None
+
+    def on_ticker_tick(self, widget, frame_clock):
+        """Advance the ticker tape on the frame clock"""
+        now = frame_clock.get_frame_time() / 1000000.0
+        if self.ticker_last_frame_time is not None:
+            self.ticker_offset += ((now - self.ticker_last_frame_time) *
+                                   self.preferences['ticker_speed'])
+            if self.ticker_total_width:
+                self.ticker_offset %= self.ticker_total_width
+        self.ticker_last_frame_time = now
+
+        # Only whole-pixel moves are drawn, and only within the budget
+        if (int(self.ticker_offset) != self.ticker_drawn_offset and
+                self.ticker_budget.should_draw(time.perf_counter())):
+            widget.queue_draw()
+        return True  # Keep ticking
+
+    def format_ticker_item(self, series):
+        """Ticker texts for a symbol: (symbol and price, change, rising)"""
+        prices = series.snapshot.prices
+        if not prices:
+            return f"{series.symbol} --", "", True
+        price = prices[-1]
+        first = prices[0]
+        change = (price - first) / first * 100 if first else 0.0
+        return (f"{series.symbol} {price:.2f}", f"{change:+.2f}%",
+                change >= 0)
+
+    def get_ticker_item(self, cr, series, height):
+        """Pre-rendered ticker item for a symbol: (surface, width)
+
+        Items are rendered once into a surface and reused for every frame
+        until the symbol's quote (or the look of the ticker) changes.
+        """
+        text, change_text, rising = self.format_ticker_item(series)
+        font_size = self.preferences['chart_font_size']
+        text_color = self.preferences['chart_text_color']
+        key = (text, change_text, height, font_size, text_color)
+        cached = self.ticker_items.get(series.symbol)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+
+        cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
+                            cairo.FONT_WEIGHT_BOLD)
+        cr.set_font_size(font_size)
+        text_extents = cr.text_extents(text)
+        change_extents = cr.text_extents(" " + change_text)
+        width = int(math.ceil(text_extents.x_advance +
+                              change_extents.x_advance + font_size * 2))
+
+        surface = cr.get_target().create_similar(
+            cairo.CONTENT_COLOR_ALPHA, width, max(1, height))
+        item_cr = cairo.Context(surface)
+        item_cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
+                                 cairo.FONT_WEIGHT_BOLD)
+        item_cr.set_font_size(font_size)
+        baseline = (height - text_extents.height) / 2 - text_extents.y_bearing
+        item_cr.set_source_rgb(*text_color)
+        item_cr.move_to(0, baseline)
+        item_cr.show_text(text)
+        if rising:
+            item_cr.set_source_rgb(0.2, 0.8, 0.2)
+        else:
+            item_cr.set_source_rgb(0.9, 0.3, 0.3)
+        item_cr.show_text(" " + change_text)
+        surface.flush()
+
+        self.ticker_items[series.symbol] = (key, surface, width)
+        return surface, width
+
+    def draw_ticker_tape(self, widget, cr):
+        """Draw the ticker tape and account for it in the frame budget"""
+        start = time.perf_counter()
+        allocation = widget.get_allocation()
+        self.paint_ticker_tape(cr, allocation.width, allocation.height)
+        self.ticker_budget.record(start, time.perf_counter())
+
+    def paint_ticker_tape(self, cr, width, height):
+        """Paint the visible part of the ticker tape"""
+        cr.set_source_rgb(*self.preferences['chart_background_color'])
+        cr.paint()
+
+        series_list = self.get_grid_series()
+        items = [self.get_ticker_item(cr, series, height)
+                 for series in series_list]
+        # Drop cached items of symbols no longer shown
+        if len(self.ticker_items) > len(series_list):
+            symbols = {series.symbol for series in series_list}
+            for symbol in list(self.ticker_items):
+                if symbol not in symbols:
+                    del self.ticker_items[symbol]
+
+        self.ticker_total_width = sum(w for _, w in items)
+        if not self.ticker_total_width:
+            return
+        offset = int(self.ticker_offset % self.ticker_total_width)
+        self.ticker_drawn_offset = offset
+
+        # Repeat the tape until the visible width is covered
+        x = -offset
+        while x < width:
+            for surface, item_width in items:
+                if x + item_width > 0:
+                    cr.set_source_surface(surface, x, 0)
+                    cr.paint()
+                x += item_width
+                if x >= width:
+                    break
+
     def draw_individual_chart(self, widget, cr, chart_type):
         """Draw individual chart for specific metric"""
         allocation = widget.get_allocation()
-        width = allocation.width
-        height = allocation.height
+        plot = self.chart_plots.setdefault(chart_type, ScrollingPlot())
+        self.paint_individual_chart(cr, allocation.width, allocation.height,
+                                    chart_type, plot)
+
+    def paint_individual_chart(self, cr, width, height, chart_type,
+                               plot=None):
+        """Paint a panel chart for specific metric onto a cairo context
+
+        With a ScrollingPlot, only points added since its last paint are
+        drawn if the scale is unchanged.
+        """
+
+        snapshot = self.series.snapshot  # One consistent view
 
         # Chart configuration
         config = {
-            'price': {'data': self.price_data,
+            'price': {'data': snapshot.prices,
                       'color': self.preferences['chart_line_color'],
                       'label': 'price',
                       'enabled': self.preferences['show_current_price']}
@@ -940,7 +3974,7 @@ class StockApplet:
         chart_config = config[chart_type]
 
         # Clear background
-        cr.set_source_rgb(0.1, 0.1, 0.1)
+        cr.set_source_rgb(*self.preferences['chart_background_color'])
         cr.paint()
 
         # Draw border
@@ -949,7 +3983,7 @@ class StockApplet:
         cr.rectangle(0.5, 0.5, width - 1, height - 1)
         cr.stroke()
 
-        if not self.timestamps or len(self.timestamps) < 2:
+        if len(snapshot.timestamps) < 2:
             # No data yet - show loading
             cr.set_source_rgb(0.6, 0.6, 0.6)
             cr.select_font_face("Arial", cairo.FONT_SLANT_NORMAL,
@@ -981,67 +4015,41 @@ class StockApplet:
         chart_width = width - (margin * 2)
         chart_height = height - (margin * 2)
 
-        valid_points = [(i, val) for i, val in enumerate(data)
-                        if val is not None]
-        if len(valid_points) >= 2:
+        if len(data) >= 2 and chart_width > 0 and chart_height > 0:
             # Calculate transparency alpha value (0-1)
             alpha = self.preferences['chart_transparency'] / 100.0
-
-            # Draw filled area
             fill_color = self.preferences['chart_fill_color']
-            cr.set_source_rgba(*fill_color, alpha)
-            first_point = True
-            for i, value in valid_points:
-                x = margin + (chart_width * i / (len(data) - 1))
-                y = margin + chart_height - (chart_height * value / 100)
-
-                if first_point:
-                    cr.move_to(x, y)
-                    first_point = False
-                else:
-                    cr.line_to(x, y)
-
-            # Close the path by drawing to bottom corners
-            if valid_points:
-                last_x = margin + (
-                    chart_width * (len(data) - 1) / (len(data) - 1))
-                first_x = margin
-                cr.line_to(last_x, margin + chart_height)
-                cr.line_to(first_x, margin + chart_height)
-                cr.close_path()
-                cr.fill()
 
-            # Draw line border
-            cr.set_source_rgb(*color)
-            cr.set_line_width(1.5)
-            first_point = True
-            for i, value in valid_points:
-                x = margin + (chart_width * i / (len(data) - 1))
-                if chart_type == 'price':
-                    # Use dynamic scaling for price charts
-                    prices = [v for v in data if v is not None]
-                    if prices:
-                        min_val = min(prices)
-                        max_val = max(prices)
-                        if max_val > min_val:
-                            normalized = (value - min_val) / \
-                                (max_val - min_val)
-                        else:
-                            normalized = 0.5
-                        y = margin + chart_height - (chart_height * normalized)
+            # Price charts are scaled to the prices they show
+            min_val = min(data)
+            max_val = max(data)
+            bottom = margin + chart_height
+
+            def paint_run(cr, run):
+                points = []
+                for x, value in run:
+                    fill_y = bottom - (chart_height * value / 100)
+                    if chart_type != 'price':
+                        # Use percentage scaling for other chart types
+                        line_y = fill_y
+                    elif max_val > min_val:
+                        normalized = (value - min_val) / (max_val - min_val)
+                        line_y = bottom - (chart_height * normalized)
                     else:
-                        y = margin + chart_height / 2
-                else:
-                    # Use percentage scaling for other chart types
-                    y = margin + chart_height - (chart_height * value / 100)
-
-                if first_point:
-                    cr.move_to(x, y)
-                    first_point = False
-                else:
-                    cr.line_to(x, y)
-
-            cr.stroke()
+                        line_y = margin + chart_height / 2
+                    points.append((x, fill_y, line_y))
+                paint_plot_run(cr, points, bottom, (*fill_color, alpha),
+                               color, 1.5)
+
+            if plot is None:
+                step = chart_width / (len(data) - 1)
+                paint_run(cr, [(margin + i * step, value)
+                               for i, value in enumerate(data)])
+            else:
+                key = (snapshot.symbol, min_val, max_val, fill_color,
+                       alpha, color)
+                plot.paint(cr, (margin, margin, chart_width, chart_height),
+                           key, snapshot.count, data, paint_run)
 
         # Draw current value in top-left corner
         # Draw current value in top-left corner
@@ -1077,26 +4085,34 @@ class StockApplet:
             cr.move_to(3, (self.preferences['chart_font_size'] + 2) * 2)
             cr.show_text(symbol)
 
-    def update_panel_display(self):
-        """Update the panel display based on preferences"""
+    def get_panel_widgets(self):
+        """Widgets shown in the panel for the current display mode"""
+        if self.preferences['show_ticker_tape']:
+            return [self.ticker_area]
+        if self.preferences['show_sparkline_grid']:
+            return [self.grid_area]
         if self.preferences['show_chart']:
-            # Remove label if present
-            if self.label.get_parent():
-                self.container.remove(self.label)
-            # Add chart areas
-            for area in self.chart_areas.values():
-                if area.get_parent() is None:
-                    self.container.add(area)
-        else:
-            # Remove chart areas if present
-            for area in self.chart_areas.values():
-                if area.get_parent() is not None:
-                    self.container.remove(area)
-            # Add label if not present
-            if self.label.get_parent() is None:
-                self.container.add(self.label)
+            return list(self.chart_areas.values())
+        return [self.label]
 
+    def update_panel_display(self):
+        """Update the panel display based on preferences"""
+        wanted = self.get_panel_widgets()
+        all_widgets = ([self.label, self.grid_area, self.ticker_area] +
+                       list(self.chart_areas.values()))
+
+        # Remove widgets of other display modes
+        for widget in all_widgets:
+            if widget not in wanted and widget.get_parent() is not None:
+                self.container.remove(widget)
+        # Add widgets of the current mode
+        for widget in wanted:
+            if widget.get_parent() is None:
+                self.container.add(widget)
+
+        self.grid_drawn_versions.clear()
         self.container.show_all()
+        self.redraw.mark_dirty('panel')
 
     def on_applet_size_allocate(self, allocation):
         """Handle size allocation changes"""
@@ -1110,6 +4126,787 @@ class StockApplet:
         return True
 
 
+class HeadlessStockApplet(StockApplet):
+    """The applet's fetch, persist and paint pipeline without widgets
+
+    Used by the command line tools.  There is no main loop, so display
+    refreshes only run when redraw.flush() is called, for whatever
+    consumers the tool registered.  The user's saved preferences are
+    only read with read_config, so runs are reproducible by default.
+    """
+
+    def __init__(self, data_file=None, preferences=None, read_config=False):
+        self.applet = None
+        self.config_file = os.path.expanduser(self.CONFIG_FILE)
+        self.data_file = data_file or os.path.expanduser(self.DATA_FILE)
+        self.init_state(preferences, read_config)
+        self.redraw = RedrawScheduler(use_idle=False)
+        self.background_fetch = False
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank q-th percentile (0-100) of a sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = int(math.ceil(q / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(len(sorted_values) - 1, max(0, index))]
+
+
+def print_latency_table(timings):
+    """Print p50/p95/p99/max per stage, timings in seconds"""
+    print(f"{'stage':<12}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage, values in timings.items():
+        if not values:
+            continue
+        values = sorted(values)
+        row = [percentile(values, q) * 1000 for q in (50, 95, 99, 100)]
+        print(f"{stage:<12}" + "".join(f"{v:>10.3f}" for v in row))
+
+
+def parse_symbols(value):
+    """Parse a symbol count ('50') or a comma-separated list of symbols"""
+    if value.isdigit():
+        return [f"SYM{i:03d}" for i in range(int(value))]
+    return parse_symbol_list(value)
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least one"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be positive: {value}")
+    return number
+
+
+def cmd_bench(args):
+    """Drive the fetch -> persist -> redraw pipeline from a local source"""
+    if args.provider == 'replay':
+        if not args.source:
+            print("The replay provider needs --source")
+            return 2
+        provider = ReplayProvider(args.source)
+        default_symbols = ','.join(provider.symbols()) or 'NVDA'
+    else:
+        provider = SimulatedProvider(volatility=args.volatility,
+                                     seed=args.seed)
+        default_symbols = '10'
+    symbols = parse_symbols(args.symbols or default_symbols)
+    if not symbols:
+        print("--symbols needs at least one symbol")
+        return 2
+
+    timings = {'fetch': [], 'persist': [], 'redraw': [], 'tooltip': [],
+               'end-to-end': []}
+
+    def timed(stage, func):
+        def wrapper():
+            start = time.perf_counter()
+            func()
+            timings[stage].append(time.perf_counter() - start)
+        return wrapper
+
+    panel_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 24)
+    window_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 600, 400)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        applets = []
+        for symbol in symbols:
+            applet = HeadlessStockApplet(
+                data_file=os.path.join(data_dir, f"{symbol}.txt"),
+                preferences={'stock_symbol': symbol},
+                read_config=args.config)
+            applet.provider = provider
+            width = applet.preferences['chart_width']
+            applet.redraw.register('panel', timed(
+                'redraw', lambda a=applet, w=width: a.paint_individual_chart(
+                    cairo.Context(panel_surface), w, 24, 'price')))
+            applet.redraw.register('tooltip', timed(
+                'tooltip', applet.build_tooltip_text))
+            if args.chart_window:
+                applet.redraw.register('window', timed(
+                    'redraw', lambda a=applet: a.paint_chart(
+                        cairo.Context(window_surface), 600, 400)))
+            applets.append(applet)
+
+        start = time.perf_counter()
+        for n in range(args.updates):
+            applet = applets[n % len(applets)]
+            scheduled = None
+            if args.rate:
+                scheduled = start + n / args.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            t0 = time.perf_counter()
+            data = applet.get_stock_data()
+            t1 = time.perf_counter()
+            applet.apply_stock_data(data)
+            t2 = time.perf_counter()
+            applet.redraw.flush()
+            t3 = time.perf_counter()
+
+            timings['fetch'].append(t1 - t0)
+            timings['persist'].append(t2 - t1)
+            # Includes time spent behind schedule when pacing
+            timings['end-to-end'].append(t3 - (scheduled or t0))
+        elapsed = time.perf_counter() - start
+
+    print(f"{provider.name}: {len(symbols)} symbols, {args.updates} updates "
+          f"in {elapsed:.2f} s ({args.updates / elapsed:.0f} updates/s)")
+    print_latency_table(timings)
+    return 0
+
+
+def current_rss():
+    """Resident set size of this process in bytes, None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# p95 latencies below this (seconds) are timer noise, not drift
+SOAK_LATENCY_FLOOR = 0.0001
+
+
+def check_soak_drift(first, last, args):
+    """Compare the first and last soak samples, return failure messages"""
+    failures = []
+    if first['rss'] is not None and last['rss'] is not None:
+        growth = (last['rss'] - first['rss']) / 2 ** 20
+        if growth > args.max_rss_growth:
+            failures.append(f"RSS grew by {growth:.1f} MB "
+                            f"(limit {args.max_rss_growth} MB)")
+    growth = last['objects'] - first['objects']
+    if growth > args.max_object_growth:
+        failures.append(f"{growth} more live objects "
+                        f"(limit {args.max_object_growth})")
+    for stage, p95 in last['p95'].items():
+        base = max(first['p95'].get(stage, 0.0), SOAK_LATENCY_FLOOR)
+        if p95 > base * args.max_latency_growth:
+            failures.append(f"{stage} p95 grew from "
+                            f"{first['p95'].get(stage, 0.0) * 1000:.3f} to "
+                            f"{p95 * 1000:.3f} ms "
+                            f"(limit x{args.max_latency_growth})")
+    return failures
+
+
+def cmd_soak(args):
+    """Run the update -> persist -> redraw -> tooltip cycle for a long time
+
+    Every --sample-every iterations, memory use, live objects, history
+    size and per-stage latency percentiles are recorded.  The run fails
+    if they drift from the first sample by more than the limits.
+    """
+    if args.provider == 'replay':
+        if not args.source:
+            print("The replay provider needs --source")
+            return 2
+        provider = ReplayProvider(args.source)
+        default_symbols = ','.join(provider.symbols()) or 'NVDA'
+    else:
+        provider = SimulatedProvider(volatility=args.volatility,
+                                     seed=args.seed)
+        default_symbols = '5'
+    symbols = parse_symbols(args.symbols or default_symbols)
+    if not symbols:
+        print("--symbols needs at least one symbol")
+        return 2
+
+    stages = ('update', 'panel', 'window', 'tooltip', 'end-to-end')
+    timings = {stage: [] for stage in stages}  # Current sample window
+
+    def timed(stage, func):
+        def wrapper():
+            start = time.perf_counter()
+            func()
+            timings[stage].append(time.perf_counter() - start)
+        return wrapper
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    panel_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 100, 24)
+    window_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 600, 400)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        # The main symbol plus a held watchlist exercises the watchlist,
+        # sparkline grid and portfolio paths too
+        applet = HeadlessStockApplet(
+            data_file=os.path.join(data_dir, f"{symbols[0]}.txt"),
+            preferences={'stock_symbol': symbols[0],
+                         'watchlist': symbols[1:],
+                         'portfolio': {symbol: {'quantity': 10,
+                                                'cost_basis': 100.0}
+                                       for symbol in symbols}},
+            read_config=args.config)
+        applet.provider = provider
+        panel_plot = ScrollingPlot()
+        window_plot = ScrollingPlot()
+        width = applet.preferences['chart_width']
+
+        def paint_panel():
+            applet.paint_individual_chart(cairo.Context(panel_surface),
+                                          width, 24, 'price', panel_plot)
+            applet.paint_sparkline_grid(cairo.Context(panel_surface),
+                                        100, 24)
+
+        applet.redraw.register('panel', timed('panel', paint_panel))
+        applet.redraw.register('window', timed(
+            'window', lambda: applet.paint_chart(
+                cairo.Context(window_surface), 600, 400, window_plot)))
+        applet.redraw.register('tooltip', timed(
+            'tooltip', applet.build_tooltip_text))
+        history_files = [applet.data_file] + [
+            series.data_file for series in applet.watchlist.values()]
+
+        def take_sample(iteration):
+            gc.collect()
+            sample = {
+                'iteration': iteration,
+                'elapsed': time.perf_counter() - start,
+                'rss': current_rss(),
+                'objects': len(gc.get_objects()),
+                'history': sum(os.path.getsize(path)
+                               for path in history_files
+                               if os.path.exists(path)),
+                'p95': {},
+            }
+            for stage in stages:
+                values = sorted(timings[stage])
+                if values:
+                    sample['p95'][stage] = percentile(values, 95)
+                timings[stage] = []
+            rss = (f"{sample['rss'] / 2 ** 20:>9.1f}"
+                   if sample['rss'] is not None else f"{'?':>9}")
+            print(f"{iteration:>10}{sample['elapsed']:>9.0f}{rss}"
+                  f"{sample['objects']:>10}"
+                  f"{sample['history'] / 2 ** 20:>10.1f}" +
+                  "".join(f"{sample['p95'].get(stage, 0.0) * 1000:>11.3f}"
+                          for stage in stages), flush=True)
+            return sample
+
+        print(f"{provider.name}: {len(symbols)} symbols, "
+              f"{args.iterations} iterations")
+        print(f"{'iteration':>10}{'time s':>9}{'RSS MB':>9}{'objects':>10}"
+              f"{'hist MB':>10}" +
+              "".join(f"{stage:>11}" for stage in stages) + "  (p95 ms)")
+
+        samples = []
+        first_objects = None
+        first_snapshot = None
+        start = time.perf_counter()
+        for n in range(1, args.iterations + 1):
+            scheduled = None
+            if args.rate:
+                scheduled = start + n / args.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            t0 = time.perf_counter()
+            applet.update_stock_info()
+            t1 = time.perf_counter()
+            applet.redraw.flush()
+            t2 = time.perf_counter()
+            timings['update'].append(t1 - t0)
+            timings['end-to-end'].append(t2 - (scheduled or t0))
+
+            if n % args.sample_every == 0 or n == args.iterations:
+                samples.append(take_sample(n))
+                if first_objects is None:
+                    # Baseline after the first window, once caches and
+                    # the in-memory windows of points are filled
+                    first_objects = Counter(
+                        type(o).__name__ for o in gc.get_objects())
+                    if args.tracemalloc:
+                        first_snapshot = tracemalloc.take_snapshot()
+
+        last_objects = Counter(type(o).__name__ for o in gc.get_objects())
+        last_snapshot = (tracemalloc.take_snapshot() if args.tracemalloc
+                         else None)
+
+    first, last = samples[0], samples[-1]
+    iterations = last['iteration'] - first['iteration']
+    print()
+    print(f"{args.iterations / last['elapsed']:.0f} iterations/s, history "
+          f"{(last['history'] - first['history']) / max(1, iterations):.0f}"
+          " bytes per iteration")
+
+    growth = last_objects - first_objects
+    if growth:
+        print("Growing object types:")
+        for name, count in growth.most_common(args.top):
+            print(f"  {name:<30}{count:>+10}")
+    if last_snapshot is not None:
+        print("Growing allocation sites:")
+        for stat in last_snapshot.compare_to(first_snapshot,
+                                             'lineno')[:args.top]:
+            print(f"  {stat}")
+        tracemalloc.stop()
+
+    failures = check_soak_drift(first, last, args) if len(samples) > 1 else []
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS")
+    return 1 if failures else 0
+
+
+HISTORY_FORMATS = ('csv', 'ndjson', 'parquet')
+
+
+def guess_history_format(path, default='csv'):
+    """Guess the import/export format from a file name"""
+    extension = os.path.splitext(path or '')[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'ndjson'
+    if extension in ('parquet', 'pq'):
+        return 'parquet'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def require_pyarrow():
+    """Import pyarrow for Parquet support (optional dependency)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support needs pyarrow "
+                           "(apt install python3-pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+def iter_batches(iterable, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_history(points, fmt, output, batch_size=10000):
+    """Stream (timestamp, price) points to output, return the count
+
+    output is a text file object for csv/ndjson and a path for parquet.
+    """
+    count = 0
+    if fmt == 'parquet':
+        pyarrow, parquet = require_pyarrow()
+        schema = pyarrow.schema([('timestamp', pyarrow.float64()),
+                                 ('price', pyarrow.float64())])
+        with parquet.ParquetWriter(output, schema) as writer:
+            for batch in iter_batches(points, batch_size):
+                timestamps, prices = zip(*batch)
+                writer.write_table(pyarrow.table(
+                    {'timestamp': timestamps, 'price': prices},
+                    schema=schema))
+                count += len(batch)
+    elif fmt == 'ndjson':
+        for timestamp, price in points:
+            output.write(json.dumps({'timestamp': timestamp,
+                                     'price': price}) + "\n")
+            count += 1
+    else:
+        writer = csv.writer(output)
+        writer.writerow(['timestamp', 'price'])
+        for timestamp, price in points:
+            writer.writerow([timestamp, price])
+            count += 1
+    return count
+
+
+def iter_import_points(path, fmt, batch_size=10000):
+    """Stream (timestamp, price) points from an exported file"""
+    if fmt == 'parquet':
+        _, parquet = require_pyarrow()
+        parquet_file = parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(
+                batch_size=batch_size, columns=['timestamp', 'price']):
+            yield from zip(batch.column(0).to_pylist(),
+                           batch.column(1).to_pylist())
+        return
+
+    with open(path, 'r', newline='') as f:
+        if fmt == 'ndjson':
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        for record in records:
+            yield float(record['timestamp']), float(record['price'])
+
+
+def import_history(data_file, points, batch_size=100000):
+    """Merge points into the history file in bounded memory
+
+    Points are sorted in batches into temporary run files, which are then
+    merged with the existing (time ordered) history into a new file that
+    replaces the old one.  Points whose timestamp is already in the
+    history, or in the range sealed in its archive, are skipped.  Returns
+    the number of points read.
+    """
+    count = 0
+    runs = []
+    temp_path = None
+    archive = HistoryArchive.for_history(data_file)
+    if archive.exists():
+        sealed_ms = archive.last_ms()
+        points = (point for point in points
+                  if sealed_ms is None or round(point[0] * 1000) > sealed_ms)
+    try:
+        for batch in iter_batches(points, batch_size):
+            batch.sort()
+            run = tempfile.TemporaryFile('w+')
+            run.writelines(format_history_line(timestamp, price)
+                           for timestamp, price in batch)
+            run.seek(0)
+            runs.append(run)
+            count += len(batch)
+
+        # Existing points go first so they win on equal timestamps, and
+        # their lines are copied as they are (with the stored quote fields)
+        # Lines appended while we merge are copied over by replace_history
+        size = 0
+        sources = []
+        if os.path.exists(data_file):
+            size = history_size(data_file)
+            sources.append(iter_history_lines(data_file, size))
+        sources.extend(((parse_history_line(line), line) for line in run)
+                       for run in runs)
+
+        data_dir = os.path.dirname(data_file) or '.'
+        fd, temp_path = tempfile.mkstemp(dir=data_dir,
+                                         prefix='.price_history.')
+        with os.fdopen(fd, 'w') as f:
+            last_timestamp = None
+            for (timestamp, price), line in heapq.merge(
+                    *sources, key=lambda record: record[0][0]):
+                if timestamp != last_timestamp:
+                    f.write(line.rstrip('\n') + '\n')
+                    last_timestamp = timestamp
+        replace_history(data_file, temp_path, size)
+        temp_path = None
+    finally:
+        for run in runs:
+            run.close()
+        if temp_path is not None:
+            os.unlink(temp_path)
+    return count
+
+
+def cmd_export(args):
+    """Export the price history as CSV, NDJSON or Parquet"""
+    fmt = args.format or guess_history_format(args.output)
+    data_file = args.data_file or os.path.expanduser(StockApplet.DATA_FILE)
+    if not os.path.exists(data_file):
+        print(f"No price history at {data_file}", file=sys.stderr)
+        return 1
+    points = iter_history_file(data_file)
+
+    if fmt == 'parquet':
+        if args.output in (None, '-'):
+            print("Parquet export needs --output FILE", file=sys.stderr)
+            return 2
+        count = export_history(points, fmt, args.output)
+    elif args.output in (None, '-'):
+        count = export_history(points, fmt, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as f:
+            count = export_history(points, fmt, f)
+
+    print(f"Exported {count} points", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args):
+    """Import price history exported by cmd_export (or other tools)"""
+    fmt = args.format or guess_history_format(args.input)
+    if not os.path.exists(args.input):
+        print(f"No such file: {args.input}", file=sys.stderr)
+        return 1
+    data_file = args.data_file or os.path.expanduser(StockApplet.DATA_FILE)
+    os.makedirs(os.path.dirname(data_file), mode=0o755, exist_ok=True)
+
+    count = import_history(
+        data_file, iter_import_points(args.input, fmt, args.batch_size),
+        args.batch_size)
+    print(f"Imported {count} points into {data_file}")
+    return 0
+
+
+# Chart colors for the render command, by theme name
+RENDER_THEMES = {
+    'dark': {'chart_background_color': (0.1, 0.1, 0.1),
+             'chart_line_color': (0.2, 0.8, 0.2),
+             'chart_fill_color': (0.2, 0.8, 0.2),
+             'chart_text_color': (1.0, 1.0, 1.0)},
+    'light': {'chart_background_color': (1.0, 1.0, 1.0),
+              'chart_line_color': (0.1, 0.4, 0.8),
+              'chart_fill_color': (0.1, 0.4, 0.8),
+              'chart_text_color': (0.1, 0.1, 0.1)},
+}
+
+
+def find_history_files(data_dir=None):
+    """Map symbols to history files (SYMBOL.txt), the applet's by default"""
+    if data_dir:
+        return {os.path.splitext(name)[0].upper(): os.path.join(data_dir, name)
+                for name in sorted(os.listdir(data_dir))
+                if name.endswith('.txt')}
+
+    # The main symbol comes from the user's preferences
+    applet = HeadlessStockApplet(preferences={'watchlist': [],
+                                              'portfolio': {}},
+                                 read_config=True)
+    history_dir = os.path.join(os.path.dirname(applet.data_file), 'history')
+    files = {applet.series.symbol: applet.data_file}
+    if os.path.isdir(history_dir):
+        for symbol, path in find_history_files(history_dir).items():
+            files.setdefault(symbol, path)
+    return files
+
+
+def render_chart(task):
+    """Render one symbol's chart to an image file, return an error or None
+
+    Runs in a worker process of the render command.
+    """
+    symbol, data_file, output, fmt, width, height, chart, preferences = task
+    try:
+        # Colors come from the user's preferences unless themed
+        applet = HeadlessStockApplet(
+            data_file=data_file,
+            preferences=dict(preferences, stock_symbol=symbol,
+                             watchlist=[], portfolio={}),
+            read_config=True)
+        if fmt == 'svg':
+            surface = cairo.SVGSurface(output, width, height)
+        else:
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        cr = cairo.Context(surface)
+        if chart == 'panel':
+            applet.paint_individual_chart(cr, width, height, 'price')
+        else:
+            applet.paint_chart(cr, width, height)
+        if fmt == 'png':
+            surface.write_to_png(output)
+        surface.finish()
+    except Exception as e:
+        return f"{symbol}: {e}"
+    return None
+
+
+def cmd_render(args):
+    """Render charts of many symbols to PNG or SVG files in parallel"""
+    files = find_history_files(args.data_dir)
+    symbols = parse_symbol_list(' '.join(args.symbols)) or list(files)
+    missing = [symbol for symbol in symbols if symbol not in files]
+    if missing:
+        print(f"No price history for {', '.join(missing)}", file=sys.stderr)
+        symbols = [symbol for symbol in symbols if symbol in files]
+    if not symbols:
+        print("Nothing to render", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    preferences = {'quote_provider': 'simulated'}  # Never touch the network
+    if args.theme:
+        preferences.update(RENDER_THEMES[args.theme])
+    tasks = [(symbol, files[symbol],
+              os.path.join(args.output_dir,
+                           f"{symbol.replace(os.sep, '_')}.{args.format}"),
+              args.format, args.width, args.height, args.chart, preferences)
+             for symbol in symbols]
+
+    jobs = min(args.jobs or os.cpu_count() or 1, len(tasks))
+    start = time.perf_counter()
+    if jobs == 1:
+        errors = [render_chart(task) for task in tasks]
+    else:
+        # Chunks keep the per-task overhead of the pool small
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            errors = list(pool.map(render_chart, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    errors = [error for error in errors if error]
+    for error in errors:
+        print(f"Error rendering {error}", file=sys.stderr)
+    print(f"Rendered {len(tasks) - len(errors)} charts to {args.output_dir} "
+          f"in {elapsed:.2f} s ({jobs} processes)")
+    return 1 if errors else 0
+
+
+def cmd_archive(args):
+    """Seal older history points into compressed archive blocks"""
+    if args.data_file:
+        files = {'': args.data_file}
+    else:
+        files = find_history_files()
+
+    for symbol, data_file in files.items():
+        name = symbol or data_file
+        if not os.path.exists(data_file):
+            print(f"{name}: no price history")
+            continue
+        count = archive_history(data_file, args.keep)
+        archive = HistoryArchive.for_history(data_file)
+        if not archive.exists():
+            print(f"{name}: nothing to archive")
+            continue
+        points = sum(block[5] for block in archive.get_blocks())
+        size = os.path.getsize(archive.path)
+        print(f"{name}: archived {count} points, {points} in "
+              f"{len(archive.get_blocks())} blocks, {size} bytes "
+              f"({size / max(points, 1):.1f} bytes/point)")
+    return 0
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='stock_applet.py',
+        description="Stock Applet for the MATE panel. Without a command "
+                    "it runs as the panel applet factory.")
+    commands = parser.add_subparsers(dest='command')
+
+    bench = commands.add_parser(
+        'bench', help="measure fetch/persist/redraw throughput offline")
+    bench.add_argument('--provider', choices=['simulated', 'replay'],
+                       default='simulated', help="local quote source")
+    bench.add_argument('--source', help="recorded quotes file (replay)")
+    bench.add_argument('--symbols',
+                       help="number of symbols or comma-separated list")
+    bench.add_argument('--updates', type=positive_int, default=10000,
+                       help="total number of quote updates")
+    bench.add_argument('--rate', type=float, default=0,
+                       help="target updates per second "
+                            "(default: as fast as possible)")
+    bench.add_argument('--volatility', type=float, default=0.002,
+                       help="per-update volatility (simulated)")
+    bench.add_argument('--seed', type=int, help="random seed (simulated)")
+    bench.add_argument('--chart-window', action='store_true',
+                       help="also paint the chart window on every update")
+    bench.add_argument('--config', action='store_true',
+                       help="start from the saved preferences instead "
+                            "of the defaults")
+    bench.add_argument('--data-dir',
+                       help="keep history files here instead of a "
+                            "temporary directory")
+    bench.set_defaults(func=cmd_bench)
+
+    soak = commands.add_parser(
+        'soak', help="run the update cycle for a long time and fail on "
+                     "memory or latency drift")
+    soak.add_argument('--provider', choices=['simulated', 'replay'],
+                      default='simulated', help="local quote source")
+    soak.add_argument('--source', help="recorded quotes file (replay)")
+    soak.add_argument('--symbols',
+                      help="number of symbols or comma-separated list; "
+                           "the first is the main symbol, the rest the "
+                           "watchlist")
+    soak.add_argument('--iterations', type=positive_int, default=1000000,
+                      help="number of update cycles")
+    soak.add_argument('--rate', type=float, default=0,
+                      help="target cycles per second "
+                           "(default: as fast as possible)")
+    soak.add_argument('--sample-every', type=positive_int, default=10000,
+                      help="iterations between samples")
+    soak.add_argument('--max-rss-growth', type=float, default=16,
+                      help="allowed RSS growth in MB")
+    soak.add_argument('--max-object-growth', type=int, default=5000,
+                      help="allowed growth of live objects")
+    soak.add_argument('--max-latency-growth', type=float, default=2.0,
+                      help="allowed growth factor of each stage's p95")
+    soak.add_argument('--tracemalloc', action='store_true',
+                      help="report the allocation sites that grew "
+                           "(slows the run down)")
+    soak.add_argument('--top', type=int, default=10,
+                      help="growing object types and sites to report")
+    soak.add_argument('--volatility', type=float, default=0.002,
+                      help="per-update volatility (simulated)")
+    soak.add_argument('--seed', type=int, help="random seed (simulated)")
+    soak.add_argument('--config', action='store_true',
+                      help="start from the saved preferences instead "
+                           "of the defaults")
+    soak.add_argument('--data-dir',
+                      help="keep history files here instead of a "
+                           "temporary directory")
+    soak.set_defaults(func=cmd_soak)
+
+    export = commands.add_parser(
+        'export', help="export the price history")
+    export.add_argument('-o', '--output',
+                        help="output file (default: standard output)")
+    export.add_argument('--format', choices=HISTORY_FORMATS,
+                        help="file format (default: from the file name, "
+                             "else csv)")
+    export.add_argument('--data-file', help="price history file")
+    export.set_defaults(func=cmd_export)
+
+    history_import = commands.add_parser(
+        'import', help="merge exported data into the price history")
+    history_import.add_argument('input', help="file to import")
+    history_import.add_argument('--format', choices=HISTORY_FORMATS,
+                                help="file format (default: from the "
+                                     "file name, else csv)")
+    history_import.add_argument('--data-file', help="price history file")
+    history_import.add_argument('--batch-size', type=int, default=100000,
+                                help="points sorted in memory at a time")
+    history_import.set_defaults(func=cmd_import)
+
+    archive = commands.add_parser(
+        'archive', help="seal older history into compressed blocks")
+    archive.add_argument('--keep', type=int, default=1440,
+                         help="newest points to keep in the history file")
+    archive.add_argument('--data-file',
+                         help="price history file (default: the main "
+                              "symbol's and the watchlist's)")
+    archive.set_defaults(func=cmd_archive)
+
+    render = commands.add_parser(
+        'render', help="render charts to image files without a display")
+    render.add_argument('symbols', nargs='*',
+                        help="symbols to render (default: all with history)")
+    render.add_argument('-o', '--output-dir', default='.',
+                        help="directory for the images (default: current)")
+    render.add_argument('--format', choices=['png', 'svg'], default='png',
+                        help="image format")
+    render.add_argument('--width', type=int, default=600,
+                        help="image width in pixels")
+    render.add_argument('--height', type=int, default=400,
+                        help="image height in pixels")
+    render.add_argument('--chart', choices=['window', 'panel'],
+                        default='window',
+                        help="chart window or panel chart layout")
+    render.add_argument('--theme', choices=sorted(RENDER_THEMES),
+                        help="chart colors (default: from preferences)")
+    render.add_argument('--jobs', type=int,
+                        help="worker processes (default: CPU count)")
+    render.add_argument('--data-dir',
+                        help="directory of SYMBOL.txt history files "
+                             "(default: the applet's history)")
+    render.set_defaults(func=cmd_render)
+
+    return parser
+
+
+def run_command(argv):
+    """Run a command line tool instead of the applet factory"""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 2
+    return args.func(args)
+
+
 def applet_factory(applet, iid, data):
     if iid != "StockApplet":
         return False
@@ -1119,13 +4916,15 @@ def applet_factory(applet, iid, data):
 
 
 def main():
-    import sys
     import signal
 
     # Handle SIGINT and SIGTERM gracefully
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
+
     try:
         MatePanelApplet.Applet.factory_main("StockAppletFactory", True,
                                             MatePanelApplet.Applet.__gtype__,
@@ -0,0 +1,13 @@
+import os
+import sys
+
+# stock_applet.py is a script, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'mate'))
+
+
+def write_history(path, points):
+    """Write (timestamp, price) points as a history file, return its path"""
+    import stock_applet
+    path.write_text(''.join(stock_applet.format_history_line(timestamp, price)
+                            for timestamp, price in points))
+    return str(path)
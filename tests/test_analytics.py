@@ -0,0 +1,38 @@
+import math
+
+import pytest
+
+from conftest import write_history
+
+sa = pytest.importorskip('stock_applet')
+
+
+def walk(moves, start=100.0, step=600):
+    prices = [start]
+    for move in moves:
+        prices.append(prices[-1] * math.exp(move))
+    return [(i * step, price) for i, price in enumerate(prices)]
+
+
+MOVES = [0.01, -0.02, 0.015, -0.005, 0.02, -0.01, 0.005, -0.015]
+
+
+def test_beta_uses_an_unwatched_benchmark_history(tmp_path):
+    files = {'NVDA': write_history(tmp_path / 'NVDA.txt',
+                                   walk([2 * m for m in MOVES]))}
+    benchmark_file = write_history(tmp_path / 'SPY.txt', walk(MOVES))
+
+    result = sa.compute_analytics(files, 'SPY', 600, 20, benchmark_file)
+
+    assert result['symbols'] == ['NVDA']
+    assert result['benchmark_points'] == len(MOVES) + 1
+    assert result['stats']['NVDA']['beta'] == pytest.approx(2.0)
+
+
+def test_beta_without_benchmark_history(tmp_path):
+    files = {'NVDA': write_history(tmp_path / 'NVDA.txt', walk(MOVES))}
+
+    result = sa.compute_analytics(files, 'SPY', 600, 20)
+
+    assert result['benchmark_points'] == 0
+    assert result['stats']['NVDA']['beta'] is None
@@ -0,0 +1,110 @@
+import http.client
+import json
+import os
+import socket
+import stat
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.mark.parametrize('header, matches', [
+    ('"NVDA-3"', True),
+    ('W/"NVDA-3"', True),
+    ('"AAPL-1", "NVDA-3"', True),
+    ('"AAPL-1",W/"NVDA-3" ', True),
+    ('*', True),
+    ('"NVDA-31"', False),
+    ('"NVDA-3-0"', False),
+    ('NVDA-3', False),
+    ('"AAPL-1", "NVDA-30"', False),
+    ('', False),
+    (None, False),
+])
+def test_etag_matches(header, matches):
+    assert sa.etag_matches(header, '"NVDA-3"') == matches
+
+
+@pytest.fixture
+def api(tmp_path):
+    series = sa.PriceSeries('NVDA', str(tmp_path / 'NVDA.txt'))
+    series.add_quote({'current_price': 875.5, 'quote_time': 1700000000})
+    server = sa.QuoteApiServer('127.0.0.1:0')
+    server.publish([series])
+    yield server, series
+    server.stop()
+
+
+def get(server, path, etag=None):
+    host, port = server.server.server_address
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request('GET', path,
+                       headers={'If-None-Match': etag} if etag else {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_quote_is_not_sent_again_while_unchanged(api):
+    server, series = api
+    response, body = get(server, '/quotes/NVDA')
+    etag = response.getheader('ETag')
+    assert response.status == 200
+    assert json.loads(body)['price'] == 875.5
+
+    response, body = get(server, '/quotes/NVDA', f'"other", W/{etag}')
+    assert response.status == 304
+    assert response.getheader('ETag') == etag
+    assert body == b''
+
+    # A tag that merely contains the current one is a different version
+    response, body = get(server, '/quotes/NVDA', etag[:-1] + '0"')
+    assert response.status == 200
+
+
+def test_new_quote_changes_the_etag(api):
+    server, series = api
+    response, body = get(server, '/quotes')
+    etag = response.getheader('ETag')
+
+    series.add_quote({'current_price': 880.0, 'quote_time': 1700000060})
+    server.publish([series])
+
+    response, body = get(server, '/quotes', etag)
+    assert response.status == 200
+    assert response.getheader('ETag') != etag
+    assert json.loads(body)['quotes']['NVDA']['price'] == 880.0
+
+
+def test_history_range_is_cached_per_range(api):
+    server, series = api
+    response, body = get(server, '/history/NVDA?start=0')
+    etag = response.getheader('ETag')
+    assert [json.loads(line) for line in body.splitlines()] == [
+        {'t': 1700000000, 'price': 875.5}]
+
+    assert get(server, '/history/NVDA?start=0', etag)[0].status == 304
+    assert get(server, '/history/NVDA?start=1', etag)[0].status == 200
+
+
+def test_unix_socket_is_private_from_the_start(tmp_path):
+    path = str(tmp_path / 'api.sock')
+    old_umask = os.umask(0o022)
+    try:
+        server = sa.QuoteApiServer(path)
+    finally:
+        os.umask(old_umask)
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        # The process umask is restored
+        assert os.umask(0o022) == 0o022
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.sendall(b'GET /quotes HTTP/1.0\r\n\r\n')
+        assert client.recv(1024).startswith(b'HTTP/1.0 200')
+        client.close()
+    finally:
+        server.stop()
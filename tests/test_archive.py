@@ -0,0 +1,114 @@
+import math
+import random
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+def random_points(count, seed=1, start=1700000000000):
+    rng = random.Random(seed)
+    time_ms, price, points = start, 875.5, []
+    for _ in range(count):
+        time_ms += rng.choice([60000, 60000, 60000, rng.randint(0, 10 ** 6),
+                               rng.randint(0, 2 ** 40)])
+        price = rng.choice([price, round(price * (1 + rng.gauss(0, 0.01)), 2),
+                            rng.uniform(-1e300, 1e300), 0.0])
+        points.append((time_ms, price))
+    return points
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_block_round_trip(seed):
+    points = random_points(random.Random(seed).randint(1, 1024), seed)
+
+    data = sa.encode_archive_block(points)
+
+    assert sa.decode_archive_block(data, len(points)) == points
+
+
+def test_block_round_trip_of_special_prices():
+    points = [(1000, 1.0), (2000, -0.0), (2000, math.inf), (3000, -math.inf),
+              (3000 + 2 ** 62, 5e-324), (3001, 1.7976931348623157e308)]
+
+    decoded = sa.decode_archive_block(sa.encode_archive_block(points),
+                                      len(points))
+
+    assert decoded == points
+    assert math.copysign(1, decoded[1][1]) == -1
+
+
+def test_regular_polling_is_compact():
+    points = [(1700000000000 + i * 60000, 875.5) for i in range(1024)]
+
+    data = sa.encode_archive_block(points)
+
+    # The first interval takes 4 + 64 bits, then two bits per point
+    assert len(data) == 16 + math.ceil((4 + 64 + 1 + 1022 * 2) / 8)
+    assert sa.decode_archive_block(data, 1024) == points
+
+
+def test_truncated_block_is_an_error():
+    points = random_points(100)
+    data = sa.encode_archive_block(points)
+
+    with pytest.raises(ValueError):
+        sa.decode_archive_block(data[:len(data) // 2], len(points))
+
+
+@pytest.fixture
+def archived(tmp_path):
+    data_file = tmp_path / 'NVDA.txt'
+    points = [(1700000000 + i * 60, 100 + (i % 97) / 4) for i in range(5000)]
+    data_file.write_text(''.join(sa.format_history_line(*point)
+                                 for point in points))
+    archived = sa.archive_history(str(data_file), keep=1000)
+    return str(data_file), points, archived
+
+
+def test_archive_history_seals_whole_blocks(archived):
+    data_file, points, count = archived
+
+    assert count == 3 * sa.HistoryArchive.BLOCK_SIZE
+    assert list(sa.iter_history_file(data_file)) == points
+    assert len(list(sa.iter_history_lines(data_file))) == 5000 - count
+
+
+def test_archive_range_scan_skips_earlier_blocks(archived):
+    data_file, points, count = archived
+    archive = sa.HistoryArchive.for_history(data_file)
+    start = points[2500][0]
+
+    scanned = list(archive.iter_points(start))
+
+    # The last point of the block before start, then whole blocks
+    assert scanned[0] == points[2047]
+    assert scanned[1:] == points[2048:count]
+
+
+def test_archive_range_scan_stops_after_end(archived):
+    data_file, points, count = archived
+    archive = sa.HistoryArchive.for_history(data_file)
+
+    scanned = list(archive.iter_points(end=points[100][0]))
+
+    assert scanned == points[:sa.HistoryArchive.BLOCK_SIZE]
+
+
+def test_history_since_reads_archive_and_file(archived):
+    data_file, points, count = archived
+    start = points[2500][0]
+
+    since = [point for point in sa.iter_history_since(data_file, start)
+             if point[0] >= start]
+
+    assert since == points[2500:]
+
+
+def test_appending_skips_archived_points(archived):
+    data_file, points, count = archived
+    archive = sa.HistoryArchive.for_history(data_file)
+
+    assert archive.append(points[:count]) == 0
+    assert archive.append(points[count:count + 10]) == 10
+    assert list(archive.iter_points()) == points[:count + 10]
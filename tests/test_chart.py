@@ -0,0 +1,44 @@
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.fixture
+def applet(tmp_path):
+    applet = sa.HeadlessStockApplet(data_file=str(tmp_path / 'NVDA.txt'))
+    for i in range(10):
+        applet.series.append(100.0 + i, 1700000000 + i * 60)
+    return applet
+
+
+def paint(paint_func, width, height, *args):
+    surface = sa.cairo.ImageSurface(sa.cairo.FORMAT_ARGB32, 200, 200)
+    paint_func(sa.cairo.Context(surface), width, height, *args)
+
+
+@pytest.mark.parametrize('width, height', [(0, 0), (50, 300), (300, 40),
+                                           (80, 300), (300, 60)])
+def test_chart_window_too_small_for_a_plot(applet, width, height):
+    paint(applet.paint_chart, width, height, sa.ScrollingPlot())
+
+    assert applet.chart_points is None
+    assert applet.find_chart_point(10) is None
+
+
+def test_smallest_chart_window_with_a_plot(applet):
+    paint(applet.paint_chart, 81, 61, sa.ScrollingPlot())
+
+    assert applet.chart_points is not None
+    assert applet.find_chart_point(1000) == 9
+
+
+def test_crosshair_without_point_spacing(applet):
+    applet.chart_points = (applet.series.snapshot, 60, 0, 100.0, 109.0)
+
+    assert applet.find_chart_point(60) is None
+
+
+@pytest.mark.parametrize('width, height', [(0, 24), (4, 24), (50, 4)])
+def test_panel_chart_too_small_for_a_plot(applet, width, height):
+    paint(applet.paint_individual_chart, width, height, 'price',
+          sa.ScrollingPlot())
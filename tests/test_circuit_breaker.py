@@ -0,0 +1,67 @@
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+def test_opens_after_threshold_and_probes_after_delay():
+    breaker = sa.CircuitBreaker(failure_threshold=3, base_delay=60,
+                                max_delay=1800)
+    for _ in range(3):
+        assert breaker.allow(now=0)
+        breaker.record_failure(now=0)
+    assert breaker.state == 'open'
+    assert not breaker.allow(now=59)
+    assert breaker.allow(now=60)
+    assert breaker.state == 'half_open'
+
+
+def test_failed_probe_doubles_delay_up_to_max():
+    breaker = sa.CircuitBreaker(failure_threshold=1, base_delay=60,
+                                max_delay=200)
+    breaker.record_failure(now=0)
+    assert breaker.open_until == 60
+    assert breaker.allow(now=60)
+    breaker.record_failure(now=60)
+    assert breaker.open_until == 60 + 120
+    assert breaker.allow(now=180)
+    breaker.record_failure(now=180)
+    assert breaker.open_until == 180 + 200
+
+
+def test_success_closes_and_resets_backoff():
+    breaker = sa.CircuitBreaker(failure_threshold=1, base_delay=60)
+    breaker.record_failure(now=0)
+    assert breaker.allow(now=60)
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.trips == 0
+    breaker.record_failure(now=100)
+    assert breaker.open_until == 160
+
+
+@pytest.mark.parametrize('interval', [60, 600])
+def test_outage_skips_ticks_at_poll_interval(interval):
+    breaker = sa.CircuitBreaker()
+    breaker.set_interval(interval)
+    calls = []
+    for tick in range(12):
+        # A failing call returns after a 10 s timeout
+        now = tick * interval
+        if breaker.allow(now=now):
+            calls.append(tick)
+            breaker.record_failure(now=now + 10)
+    # Three failures open the breaker, then probes back off
+    assert calls == [0, 1, 2, 4, 8]
+
+
+def test_backoff_is_capped_in_ticks():
+    breaker = sa.CircuitBreaker(failure_threshold=1)
+    breaker.set_interval(600)
+    calls = []
+    for tick in range(200):
+        now = tick * 600
+        if breaker.allow(now=now):
+            calls.append(tick)
+            breaker.record_failure(now=now + 10)
+    gaps = {b - a for a, b in zip(calls, calls[1:])}
+    assert max(gaps) == 17
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from conftest import write_history
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.fixture(scope='module')
+def long_history(tmp_path_factory):
+    rng = random.Random(1)
+    timestamp, points = 1e9, []
+    for _ in range(20000):
+        timestamp += rng.uniform(1, 120)
+        points.append((timestamp, round(rng.uniform(10, 20), 2)))
+    path = tmp_path_factory.mktemp('history') / 'NVDA.txt'
+    return write_history(path, points), points
+
+
+@pytest.mark.parametrize('index', [0, 1, 777, 10000, 19999])
+def test_history_offset_starts_before_start(long_history, index):
+    path, points = long_history
+    for start in (points[index][0], points[index][0] + 0.5):
+        with open(path, 'rb') as f:
+            f.seek(sa.find_history_offset(f, start))
+            first = sa.parse_history_line(f.readline().decode().strip())
+        before = [p for p in points if p[0] < start]
+        # The point before start (if any) is read, so is everything after
+        assert first[0] <= (before[-1][0] if before else points[0][0])
+
+
+def test_history_offset_skips_most_of_the_file(long_history):
+    path, points = long_history
+    with open(path, 'rb') as f:
+        offset = sa.find_history_offset(f, points[-10][0])
+        size = f.seek(0, 2)
+    assert size - offset <= 8192
+
+
+def test_align_histories(tmp_path):
+    files = {'A': write_history(tmp_path / 'A.txt',
+                                [(100, 10.0), (200, 11.0), (300, 12.0)]),
+             'B': write_history(tmp_path / 'B.txt',
+                                [(250, 50.0), (350, 55.0)]),
+             'C': str(tmp_path / 'missing.txt')}
+
+    a, b, c = sa.align_histories(files, 150, 400, 5)
+
+    # A is known at start (10), B only from its first point on
+    assert a == pytest.approx([0.0, 10.0, 10.0, 20.0, 20.0])
+    assert b[:2] == [None, None]
+    assert b[2:] == pytest.approx([0.0, 0.0, 10.0])
+    assert c == [None] * 5
+
+
+def test_align_histories_stops_at_the_latest_point(tmp_path):
+    files = {'A': write_history(tmp_path / 'A.txt',
+                                [(100, 10.0), (150, 20.0)])}
+
+    values, = sa.align_histories(files, 100, 200, 4)
+
+    assert values[:3] == pytest.approx([0.0, 0.0, 100.0])
+    assert values[3] is None
+
+
+def test_compute_comparison_of_everything_starts_at_the_oldest_point(
+        tmp_path):
+    files = {'A': write_history(tmp_path / 'A.txt', [(500, 10.0)]),
+             'B': write_history(tmp_path / 'B.txt', [(300, 5.0), (400, 6.0)])}
+
+    start, end, values = sa.compute_comparison(files, 0, 10)
+
+    assert start == 300
+    assert len(values) == 2
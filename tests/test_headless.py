@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.fixture
+def saved_config(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    config = tmp_path / '.config' / 'stock-applet.json'
+    config.parent.mkdir()
+    config.write_text(json.dumps({'stock_symbol': 'AAPL',
+                                  'watchlist': ['MSFT']}))
+    return tmp_path
+
+
+def test_headless_ignores_saved_preferences(saved_config):
+    applet = sa.HeadlessStockApplet(
+        data_file=str(saved_config / 'data' / 'NVDA.txt'))
+    assert applet.preferences['stock_symbol'] == 'NVDA'
+    assert applet.preferences['watchlist'] == []
+
+
+def test_headless_reads_saved_preferences_on_request(saved_config):
+    applet = sa.HeadlessStockApplet(
+        data_file=str(saved_config / 'data' / 'AAPL.txt'),
+        preferences={'watchlist': []}, read_config=True)
+    assert applet.preferences['stock_symbol'] == 'AAPL'
+    assert applet.preferences['watchlist'] == []
+
+
+@pytest.mark.parametrize('argv', [
+    ['soak', '--sample-every', '0'],
+    ['soak', '--iterations', '0'],
+    ['bench', '--updates', '-1'],
+])
+def test_counts_must_be_positive(argv):
+    with pytest.raises(SystemExit) as error:
+        sa.run_command(argv)
+
+    assert error.value.code == 2
+
+
+@pytest.mark.parametrize('command', ['bench', 'soak'])
+def test_commands_need_a_symbol(command, capsys):
+    assert sa.run_command([command, '--symbols', '0']) == 2
+    assert '--symbols' in capsys.readouterr().out
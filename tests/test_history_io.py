@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import write_history
+
+sa = pytest.importorskip('stock_applet')
+
+
+def read_history(path):
+    return [point for point, line in sa.iter_history_lines(str(path))]
+
+
+def test_import_merges_and_skips_known_timestamps(tmp_path):
+    data_file = tmp_path / 'NVDA.txt'
+    write_history(data_file, [(100.0, 1.0), (300.0, 3.0)])
+
+    count = sa.import_history(str(data_file),
+                              [(400.0, 4.0), (200.0, 2.0), (300.0, 9.0)],
+                              batch_size=2)
+
+    assert count == 3
+    assert read_history(data_file) == [(100.0, 1.0), (200.0, 2.0),
+                                       (300.0, 3.0), (400.0, 4.0)]
+
+
+def test_import_keeps_points_appended_during_the_merge(tmp_path,
+                                                       monkeypatch):
+    data_file = tmp_path / 'NVDA.txt'
+    write_history(data_file, [(100.0, 1.0)])
+    history_size = sa.history_size
+
+    def size_then_append(path):
+        size = history_size(path)
+        # The applet stores a quote while the import merges
+        sa.append_history_line(path, sa.format_history_line(500.0, 5.0))
+        return size
+
+    monkeypatch.setattr(sa, 'history_size', size_then_append)
+    sa.import_history(str(data_file), [(200.0, 2.0)])
+
+    assert read_history(data_file) == [(100.0, 1.0), (200.0, 2.0),
+                                       (500.0, 5.0)]
+
+
+def test_export_missing_history_is_an_error(tmp_path, capsys):
+    data_file = tmp_path / 'NONE.txt'
+
+    status = sa.run_command(['export', '--data-file', str(data_file)])
+
+    assert status == 1
+    assert 'No price history' in capsys.readouterr().err
+
+
+def test_import_missing_input_is_an_error(tmp_path, capsys):
+    status = sa.run_command(['import', str(tmp_path / 'missing.csv'),
+                             '--data-file', str(tmp_path / 'NVDA.txt')])
+
+    assert status == 1
+    assert 'No such file' in capsys.readouterr().err
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+def test_parse_and_format_positions():
+    positions = sa.parse_positions('nvda:10@450.5, AAPL:5@170 bad:x@1 MSFT:2')
+
+    assert positions == {'NVDA': {'quantity': 10.0, 'cost_basis': 450.5},
+                         'AAPL': {'quantity': 5.0, 'cost_basis': 170.0},
+                         'MSFT': {'quantity': 2.0, 'cost_basis': 0.0}}
+    assert sa.parse_positions(sa.format_positions(positions)) == positions
+
+
+def test_totals_only_cover_quoted_positions():
+    portfolio = sa.Portfolio(sa.parse_positions('NVDA:10@100, AAPL:5@200'))
+
+    assert portfolio.apply_quote('NVDA', 110.0, 105.0)
+    assert not portfolio.apply_quote('MSFT', 300.0, 290.0)
+    assert not portfolio.apply_quote('AAPL', None)
+
+    assert portfolio.priced == 1
+    assert portfolio.market_value == pytest.approx(1100.0)
+    assert portfolio.day_change == pytest.approx(50.0)
+    assert portfolio.unrealized == pytest.approx(100.0)
+
+
+def test_new_quotes_replace_the_previous_ones():
+    portfolio = sa.Portfolio(sa.parse_positions('NVDA:10@100, AAPL:5@200'))
+    portfolio.apply_quote('NVDA', 110.0, 105.0)
+    portfolio.apply_quote('AAPL', 190.0)
+    portfolio.apply_quote('NVDA', 90.0, 105.0)
+
+    assert portfolio.priced == 2
+    assert portfolio.market_value == pytest.approx(900.0 + 950.0)
+    # No previous close means no day change for AAPL
+    assert portfolio.day_change == pytest.approx(-150.0)
+    assert portfolio.unrealized == pytest.approx(1850.0 - 2000.0)
+
+
+def test_incremental_totals_match_a_resync():
+    rng = random.Random(1)
+    symbols = [f"SYM{i}" for i in range(20)]
+    portfolio = sa.Portfolio({symbol: {'quantity': rng.randint(1, 100),
+                                       'cost_basis': rng.uniform(10, 500)}
+                              for symbol in symbols})
+    for _ in range(5000):
+        portfolio.apply_quote(rng.choice(symbols), rng.uniform(10, 500),
+                              rng.uniform(10, 500))
+    totals = (portfolio.market_value, portfolio.day_change, portfolio.cost)
+
+    portfolio.resync()
+
+    assert totals == pytest.approx(
+        (portfolio.market_value, portfolio.day_change, portfolio.cost))
+
+
+def test_held_symbols_are_fetched_with_the_watchlist(tmp_path):
+    applet = sa.HeadlessStockApplet(
+        data_file=str(tmp_path / 'NVDA.txt'),
+        preferences={'portfolio': sa.parse_positions('AAPL:5@170')})
+    applet.provider = sa.SimulatedProvider(seed=1)
+    applet.load_watchlist()
+    applet.portfolio = applet.create_portfolio()
+
+    applet.update_watchlist()
+
+    price = applet.watchlist['AAPL'].snapshot.prices[-1]
+    assert applet.portfolio.priced == 1
+    assert applet.portfolio.market_value == pytest.approx(5 * price)
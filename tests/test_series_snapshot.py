@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.fixture
+def series(tmp_path):
+    return sa.PriceSeries('NVDA', str(tmp_path / 'NVDA.txt'), max_points=5)
+
+
+def test_append_publishes_a_new_snapshot(series):
+    series.append(1.0, 100)
+    old = series.snapshot
+
+    series.append(2.0, 200)
+
+    assert old.prices == (1.0,) and old.timestamps == (100,)
+    assert series.snapshot.prices == (1.0, 2.0)
+    assert series.snapshot.version == old.version + 1
+    assert series.snapshot is not old
+
+
+def test_snapshots_keep_the_newest_points(series):
+    for i in range(8):
+        series.append(float(i), i)
+
+    snapshot = series.snapshot
+    assert snapshot.prices == (3.0, 4.0, 5.0, 6.0, 7.0)
+    assert snapshot.timestamps == (3, 4, 5, 6, 7)
+    assert snapshot.count == 8
+
+
+def test_snapshots_cannot_be_changed(series):
+    series.append(1.0, 100)
+    snapshot = series.snapshot
+
+    with pytest.raises(AttributeError):
+        snapshot.prices = ()
+    with pytest.raises(AttributeError):
+        snapshot.extra = 1
+
+
+def test_unchanged_info_keeps_the_version(series):
+    info = {'current_price': 1.0}
+    assert series.set_info(info)
+    version = series.snapshot.version
+
+    assert not series.set_info(dict(info))
+    assert series.snapshot.version == version
+
+
+def test_quotes_are_stored_once(series):
+    quote = {'current_price': 1.5, 'high': 2.0, 'quote_time': 100}
+    assert series.add_quote(quote)
+    assert not series.add_quote(dict(quote))
+    assert series.snapshot.stored_quote['high'] == 2.0
+
+    reloaded = sa.PriceSeries('NVDA', series.data_file)
+    reloaded.load()
+    assert reloaded.snapshot.prices == (1.5,)
+    assert reloaded.snapshot.stored_quote == series.snapshot.stored_quote
+
+
+def test_renaming_updates_the_snapshot(series):
+    version = series.snapshot.version
+
+    series.set_symbol('AAPL')
+    series.set_symbol('AAPL')
+
+    assert series.symbol == series.snapshot.symbol == 'AAPL'
+    assert series.snapshot.version == version + 1
+
+
+def test_readers_see_consistent_snapshots(series):
+    series.max_points = 50
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            snapshot = series.snapshot
+            if len(snapshot.prices) != len(snapshot.timestamps) or (
+                    snapshot.prices and
+                    snapshot.prices[-1] != snapshot.timestamps[-1]):
+                errors.append(snapshot)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(2000):
+        series.append(float(i), float(i))
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert series.snapshot.count == 2000
@@ -0,0 +1,51 @@
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+@pytest.fixture
+def directory():
+    return sa.SymbolDirectory([
+        ('NVDA', 'NVIDIA CORP'), ('NVAX', 'NOVAVAX INC'),
+        ('NVD', 'GRANITESHARES 2X SHORT NVDA'), ('NAVD', 'EXAMPLE NAVD'),
+        ('NVADX', 'EXAMPLE FUND'), ('AAPL', 'APPLE INC'),
+        ('VNDA', 'VANDA PHARMACEUTICALS'), ('DNVA', 'EXAMPLE DNVA'),
+        ('MSFT', 'MICROSOFT CORP'), ('AMD', 'ADVANCED MICRO DEVICES'),
+    ])
+
+
+def symbols(results):
+    return [symbol for symbol, _ in results]
+
+
+def test_prefix_matches_come_first(directory):
+    assert symbols(directory.search('nv'))[:4] == ['NVADX', 'NVAX', 'NVD',
+                                                   'NVDA']
+
+
+def test_typos_rank_swaps_then_replacements_then_missing_or_extra(
+        directory):
+    # NVAD: NVADX is a prefix match, NVDA and NAVD have neighbours
+    # swapped, NVAX has a wrong character, NVD lacks one
+    assert symbols(directory.search('NVAD')) == [
+        'NVADX', 'NAVD', 'NVDA', 'NVAX', 'NVD']
+
+
+def test_missing_and_extra_characters(directory):
+    assert symbols(directory.search('APL')) == ['AAPL']
+    assert symbols(directory.search('MSFTT')) == ['MSFT']
+
+
+def test_shifted_symbols_are_not_typos(directory):
+    # VNDA and NVDA share the deletion "VDA", but differ in two places
+    assert 'VNDA' not in symbols(directory.search('NVDX'))
+
+
+def test_descriptions_match_after_symbols(directory):
+    assert symbols(directory.search('micro')) == ['AMD', 'MSFT']
+    assert symbols(directory.search('NVIDIA')) == ['NVDA']
+
+
+def test_limit_and_empty_query(directory):
+    assert len(directory.search('N', limit=3)) == 3
+    assert directory.search('  ') == []
@@ -0,0 +1,106 @@
+import queue
+import urllib.error
+
+import pytest
+
+sa = pytest.importorskip('stock_applet')
+
+
+class FailingProvider(sa.QuoteProvider):
+    """Answers every fetch with an HTTP error"""
+
+    def __init__(self, code):
+        self.code = code
+        self.calls = 0
+
+    def fetch(self, symbol):
+        self.calls += 1
+        raise urllib.error.HTTPError('https://example.invalid', self.code,
+                                     'error', {}, None)
+
+
+@pytest.fixture
+def applet(tmp_path):
+    applet = sa.HeadlessStockApplet(
+        data_file=str(tmp_path / 'NVDA.txt'),
+        preferences={'watchlist': ['AAPL', 'MSFT']})
+    applet.load_watchlist()
+    return applet
+
+
+@pytest.mark.parametrize('code, error', [(429, 'rate_limited'),
+                                         (401, 'http_401')])
+def test_client_errors_keep_the_breaker_closed(applet, code, error):
+    applet.provider = FailingProvider(code)
+
+    for _ in range(5):
+        assert applet.get_stock_data()['error'] == error
+
+    assert applet.provider.calls == 5
+    assert applet.fetch_breaker.state == 'closed'
+
+
+def test_server_errors_open_the_breaker(applet):
+    applet.provider = FailingProvider(503)
+
+    errors = [applet.get_stock_data()['error'] for _ in range(4)]
+
+    assert errors == ['fetch_failed'] * 3 + ['circuit_open']
+    assert applet.provider.calls == 3
+
+
+def test_rate_limit_keeps_showing_the_last_quote(applet):
+    applet.apply_stock_data({'current_price': 875.5, 'high': 880.0,
+                             'low': 870.0, 'error': None})
+    applet.provider = FailingProvider(429)
+
+    applet.apply_stock_data(applet.get_stock_data())
+
+    info = applet.series.snapshot.info
+    assert info['stale'] and info['stale_error'] == 'rate_limited'
+    assert info['current_price'] == 875.5
+    assert info['fetched_at'] == applet.last_good_time
+
+
+def test_other_client_errors_replace_the_last_quote(applet):
+    applet.apply_stock_data({'current_price': 875.5, 'error': None})
+    applet.provider = FailingProvider(401)
+
+    applet.apply_stock_data(applet.get_stock_data())
+
+    assert applet.series.snapshot.info['error'] == 'http_401'
+    assert not applet.series.snapshot.info.get('stale')
+
+
+def test_headless_watchlist_is_fetched_right_away(applet):
+    applet.provider = sa.SimulatedProvider(seed=1)
+
+    applet.update_watchlist()
+
+    assert not applet.watchlist_fetching
+    for symbol in ('AAPL', 'MSFT'):
+        assert applet.watchlist[symbol].snapshot.prices
+
+
+def test_watchlist_is_fetched_off_the_main_loop(applet, monkeypatch):
+    applet.background_fetch = True
+    applet.provider = sa.SimulatedProvider(seed=1)
+    delivered = queue.Queue()
+    monkeypatch.setattr(sa.GLib, 'idle_add',
+                        lambda func, *args: delivered.put((func, args)))
+
+    applet.update_watchlist()
+    applet.update_watchlist()  # While the first batch is in flight
+    func, args = delivered.get(timeout=5)
+
+    # Quotes are only applied once the main loop runs the callback
+    assert not applet.watchlist['AAPL'].snapshot.prices
+    func(*args)
+    assert applet.watchlist['AAPL'].snapshot.prices
+
+    # The second request was held back and runs now
+    assert applet.watchlist_fetching
+    func, args = delivered.get(timeout=5)
+    func(*args)
+    assert not applet.watchlist_fetching
+    assert delivered.empty()